@@ -159,53 +159,20 @@ const App: React.FC = () => {
   };
 
   const handleDownloadIdeas = () => {
-    const headers = [
-      'ID', 'Title', 'Description', 'Status', 'Votes', 'Cluster',
-      'AI Evaluation Summary',
-      'AI Desirability Score', 'AI Desirability Reasoning',
-      'AI Feasibility Score', 'AI Feasibility Reasoning',
-      'AI Viability Score', 'AI Viability Reasoning'
-    ];
-
-    const csvRows = [headers.join(',')];
-
-    ideas.forEach(idea => {
-      const row = [
-        escapeCsvField(idea.id),
-        escapeCsvField(idea.title),
-        escapeCsvField(idea.description),
-        escapeCsvField(idea.status),
-        escapeCsvField(idea.votes),
-        escapeCsvField(idea.clusterName || ''),
-        escapeCsvField(idea.evaluation?.summary || ''),
-        escapeCsvField(idea.evaluation?.desirability.score || ''),
-        escapeCsvField(idea.evaluation?.desirability.reasoning || ''),
-        escapeCsvField(idea.evaluation?.feasibility.score || ''),
-        escapeCsvField(idea.evaluation?.feasibility.reasoning || ''),
-        escapeCsvField(idea.evaluation?.viability.score || ''),
-        escapeCsvField(idea.evaluation?.viability.reasoning || '')
-      ];
-      csvRows.push(row.join(','));
-    });
-    
-    const csvString = csvRows.join('\n');
-    const blob = new Blob([csvString], { type: 'text/csv;charset=utf-8;' });
-    const url = URL.createObjectURL(blob);
+    // Evaluation reasoning is not part of the ideas list, so the server builds the file
+    const url = apiService.getExportUrl('csv', [
+      'id', 'title', 'description', 'status', 'votes', 'cluster_name',
+      'evaluation_summary',
+      'desirability_score', 'desirability_reasoning',
+      'feasibility_score', 'feasibility_reasoning',
+      'viability_score', 'viability_reasoning'
+    ]);
     const a = document.createElement('a');
     a.href = url;
     a.download = 'ideas.csv';
     document.body.appendChild(a);
     a.click();
     document.body.removeChild(a);
-    URL.revokeObjectURL(url);
-  };
-
-  const escapeCsvField = (field: string | number): string => {
-    const stringField = String(field);
-    if (/[",\n]/.test(stringField)) {
-        return `"${stringField.replace(/"/g, '""')}"`;
-    }
-    return stringField;
   };
 
   const handleDownloadTemplate = () => {
@@ -11,11 +11,12 @@ export interface ApiIdea {
   is_classifying: boolean;
   created_at: string;
   updated_at: string;
+  // Summary and reasoning are only included by getIdea; lists carry the scores
   evaluation?: {
-    summary: string;
-    desirability: { score: number; reasoning: string };
-    feasibility: { score: number; reasoning: string };
-    viability: { score: number; reasoning: string };
+    summary: string | null;
+    desirability: { score: number; reasoning: string | null };
+    feasibility: { score: number; reasoning: string | null };
+    viability: { score: number; reasoning: string | null };
   };
 }
 
@@ -102,6 +103,11 @@ class ApiService {
     return response.json();
   }
 
+  getExportUrl(format: 'csv' | 'ndjson' | 'parquet', columns: string[]): string {
+    const params = new URLSearchParams({ format, columns: columns.join(',') });
+    return `${API_BASE_URL}/ideas/export?${params}`;
+  }
+
   async uploadIdeas(file: File): Promise<{ message: string }> {
     const formData = new FormData();
     formData.append('file', file);
@@ -0,0 +1,241 @@
+import os
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+from typing import List, Dict, Any, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class ProviderError(Exception):
+    """Raised when an LLM provider fails to produce a response"""
+
+class RateLimitError(ProviderError):
+    """Raised when an LLM provider rejects a call because of rate limiting"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class LLMResponse:
+    """Raw text returned by a provider plus token usage"""
+
+    def __init__(self, text: str, input_tokens: int = 0, output_tokens: int = 0):
+        self.text = text
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count used when a provider does not report usage"""
+    return max(1, len(text) // 4)
+
+class LLMProvider:
+    """Interface every LLM backend used by AIService implements"""
+
+    name = "base"
+
+    async def generate(self, prompt: str, task: str, context: Optional[Dict[str, Any]] = None) -> LLMResponse:
+        """Generate a response for a prompt.
+
+        `task` names the AIService operation ("evaluate", "cluster", "classify",
+        "classify_batch") and
+        `context` carries the structured inputs the prompt was built from, so backends
+        that do not read the prompt (such as the fake one) can still answer in schema.
+        """
+        raise NotImplementedError
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini backend"""
+
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None, model_name: Optional[str] = None):
+        api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY environment variable is required")
+
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name or os.getenv("GEMINI_MODEL", "models/gemini-1.5-flash"))
+
+    async def generate(self, prompt: str, task: str, context: Optional[Dict[str, Any]] = None) -> LLMResponse:
+        try:
+            # The SDK call is blocking, so run it off the event loop
+            response = await asyncio.to_thread(self.model.generate_content, prompt)
+        except Exception as e:
+            if "429" in str(e) or "ResourceExhausted" in type(e).__name__:
+                raise RateLimitError(str(e))
+            raise ProviderError(str(e)) from e
+
+        text = response.text
+        usage = getattr(response, "usage_metadata", None)
+        input_tokens = getattr(usage, "prompt_token_count", 0) or estimate_tokens(prompt)
+        output_tokens = getattr(usage, "candidates_token_count", 0) or estimate_tokens(text)
+        return LLMResponse(text, input_tokens, output_tokens)
+
+class FakeProvider(LLMProvider):
+    """Deterministic offline backend for load testing.
+
+    Response content is derived from a hash of the prompt, so the same prompt always
+    yields the same schema-valid JSON. Latency, injected errors and rate limiting are
+    drawn from a seeded RNG so a run can be reproduced.
+    """
+
+    name = "fake"
+
+    LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+    def __init__(
+        self,
+        latency_ms: float = 50.0,
+        latency_distribution: str = "lognormal",
+        latency_jitter: float = 0.5,
+        error_rate: float = 0.0,
+        rate_limit_rpm: int = 0,
+        seed: int = 0,
+    ):
+        if latency_distribution not in self.LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {latency_distribution}")
+        self.latency_ms = latency_ms
+        self.latency_distribution = latency_distribution
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.rate_limit_rpm = rate_limit_rpm
+        self._rng = random.Random(seed)
+        self._tokens = float(rate_limit_rpm)
+        self._last_refill = time.monotonic()
+        self.calls = 0
+
+    @classmethod
+    def from_env(cls) -> "FakeProvider":
+        return cls(
+            latency_ms=float(os.getenv("FAKE_LLM_LATENCY_MS", "50")),
+            latency_distribution=os.getenv("FAKE_LLM_LATENCY_DIST", "lognormal"),
+            latency_jitter=float(os.getenv("FAKE_LLM_LATENCY_JITTER", "0.5")),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            rate_limit_rpm=int(os.getenv("FAKE_LLM_RATE_LIMIT_RPM", "0")),
+            seed=int(os.getenv("FAKE_LLM_SEED", "0")),
+        )
+
+    def _sample_latency(self) -> float:
+        """Draw a latency in seconds from the configured distribution"""
+        mean = self.latency_ms / 1000.0
+        if mean <= 0:
+            return 0.0
+        if self.latency_distribution == "fixed":
+            return mean
+        if self.latency_distribution == "uniform":
+            spread = mean * self.latency_jitter
+            return max(0.0, self._rng.uniform(mean - spread, mean + spread))
+        if self.latency_distribution == "exponential":
+            return self._rng.expovariate(1.0 / mean)
+        # Lognormal with the requested mean: mu = ln(mean) - sigma^2 / 2
+        sigma = self.latency_jitter
+        return self._rng.lognormvariate(math.log(mean) - sigma * sigma / 2, sigma)
+
+    def _take_rate_limit_token(self) -> None:
+        """Token bucket refilled at rate_limit_rpm per minute"""
+        if self.rate_limit_rpm <= 0:
+            return
+        now = time.monotonic()
+        self._tokens = min(
+            float(self.rate_limit_rpm),
+            self._tokens + (now - self._last_refill) * self.rate_limit_rpm / 60.0,
+        )
+        self._last_refill = now
+        if self._tokens < 1:
+            raise RateLimitError(
+                "Fake provider rate limit exceeded",
+                retry_after=(1 - self._tokens) * 60.0 / self.rate_limit_rpm,
+            )
+        self._tokens -= 1
+
+    async def generate(self, prompt: str, task: str, context: Optional[Dict[str, Any]] = None) -> LLMResponse:
+        self.calls += 1
+        self._take_rate_limit_token()
+        await asyncio.sleep(self._sample_latency())
+        if self.error_rate and self._rng.random() < self.error_rate:
+            raise ProviderError("Fake provider injected error")
+
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        context = context or {}
+        if task == "evaluate":
+            payload = self._fake_evaluation(digest, context)
+        elif task == "cluster":
+            payload = self._fake_clusters(digest, context)
+        elif task == "classify":
+            payload = self._fake_classification(digest, context)
+        elif task == "classify_batch":
+            payload = self._fake_batch_classification(context)
+        else:
+            raise ProviderError(f"Fake provider does not support task: {task}")
+
+        text = json.dumps(payload)
+        return LLMResponse(text, estimate_tokens(prompt), estimate_tokens(text))
+
+    @staticmethod
+    def _fake_evaluation(digest: bytes, context: Dict[str, Any]) -> Dict[str, Any]:
+        title = context.get("idea", {}).get("title", "this idea")
+        evaluation = {"summary": f"Deterministic evaluation of {title}."}
+        for i, criterion in enumerate(("desirability", "feasibility", "viability")):
+            score = digest[i] % 10 + 1
+            evaluation[criterion] = {
+                "score": score,
+                "reasoning": f"{criterion.capitalize()} scored {score} from prompt hash {digest.hex()[:12]}.",
+            }
+        return evaluation
+
+    @staticmethod
+    def _fake_clusters(digest: bytes, context: Dict[str, Any]) -> List[Dict[str, Any]]:
+        ideas = context.get("ideas", [])
+        n = max(1, int(context.get("config", {}).get("numberOfClusters", 1)))
+        clusters = [
+            {
+                "clusterName": f"Cluster {digest[i % len(digest)] % 100:02d}-{i + 1}",
+                "clusterDescription": f"Deterministic cluster {i + 1}",
+                "ideaIds": [],
+            }
+            for i in range(n)
+        ]
+        for idea in ideas:
+            bucket = hashlib.sha256(idea["id"].encode("utf-8")).digest()[0] % n
+            clusters[bucket]["ideaIds"].append(idea["id"])
+        return clusters
+
+    @staticmethod
+    def _fake_classification(digest: bytes, context: Dict[str, Any]) -> Dict[str, Any]:
+        names = sorted(context.get("existing_clusters", {}))
+        # Roughly one in four ideas is sent to a new cluster
+        if names and digest[0] % 4:
+            return {
+                "reasoning": "Deterministic match to an existing cluster.",
+                "suggestionType": "EXISTING_CLUSTER",
+                "clusterName": names[digest[1] % len(names)],
+            }
+        return {
+            "reasoning": "Deterministic suggestion for a new cluster.",
+            "suggestionType": "NEW_CLUSTER",
+            "clusterName": f"New Cluster {digest[1] % 100:02d}",
+        }
+
+    @classmethod
+    def _fake_batch_classification(cls, context: Dict[str, Any]) -> List[Dict[str, Any]]:
+        suggestions = []
+        for idea in context.get("ideas", []):
+            digest = hashlib.sha256(json.dumps(idea, sort_keys=True).encode("utf-8")).digest()
+            suggestion = cls._fake_classification(digest, context)
+            suggestions.append({"ideaId": idea["id"], **suggestion})
+        return suggestions
+
+def create_provider(name: Optional[str] = None) -> LLMProvider:
+    """Build the provider selected by AI_PROVIDER (default: gemini)"""
+    name = (name or os.getenv("AI_PROVIDER", "gemini")).lower()
+    if name == "gemini":
+        return GeminiProvider()
+    if name == "fake":
+        return FakeProvider.from_env()
+    raise ValueError(f"Unknown AI_PROVIDER: {name}")
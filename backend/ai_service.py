@@ -1,20 +1,108 @@
 import os
 import json
-import google.generativeai as genai
-from typing import List, Dict, Any
+import time
+import hashlib
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
 import asyncio
+import threading
+
+from pydantic import ValidationError
+
+from ai_providers import LLMProvider, RateLimitError, create_provider
+from schemas import BatchClusterSuggestion
+from scheduler import PriorityScheduler
+from metrics import AI_CALLS, AI_CALL_DURATION, AI_TOKENS, AI_RETRIES, AI_FALLBACKS, AI_CACHE
 
 load_dotenv()
 
+# AIService method each provider task is issued from, used as the metrics label
+TASK_METHODS = {
+    "evaluate": "evaluate_idea",
+    "cluster": "cluster_ideas",
+    "classify": "classify_single_idea",
+    "classify_batch": "classify_idea_batch",
+}
+
 class AIService:
-    def __init__(self):
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY environment variable is required")
+    def __init__(self, provider: Optional[LLMProvider] = None):
+        self.provider = provider or create_provider()
+        self.max_retries = int(os.getenv("AI_MAX_RETRIES", "2"))
+        self.retry_backoff = float(os.getenv("AI_RETRY_BACKOFF_SECONDS", "0.5"))
+        # Optional LRU of raw responses keyed by prompt hash; 0 disables it
+        self.cache_size = int(os.getenv("AI_CACHE_SIZE", "0"))
+        self.batch_size = int(os.getenv("AI_CLASSIFY_BATCH_SIZE", "25"))
+        self.batch_concurrency = int(os.getenv("AI_BATCH_CONCURRENCY", "4"))
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        # Orders provider calls by the priority of the request that made them
+        self.scheduler = PriorityScheduler.from_env()
+    
+    async def _generate(self, prompt: str, task: str, context: Optional[Dict[str, Any]] = None) -> str:
+        """Call the provider, retrying rate-limited calls with exponential backoff"""
+        method = TASK_METHODS.get(task, task)
+        cache_key = None
+        if self.cache_size:
+            cache_key = task + ":" + hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._cache.move_to_end(cache_key)
+                AI_CACHE.labels(method=method, result="hit").inc()
+                return cached
+            AI_CACHE.labels(method=method, result="miss").inc()
+        
+        provider = self.provider.name
+        # The slot is kept through retries so a rate-limited provider sees no extra load.
+        # Its priority follows the context, and is raised with the flight this call serves
+        async with self.scheduler.slot():
+            started = time.perf_counter()
+            attempt = 0
+            try:
+                while True:
+                    try:
+                        response = await self.provider.generate(prompt, task, context)
+                        break
+                    except RateLimitError as e:
+                        if attempt >= self.max_retries:
+                            raise
+                        AI_RETRIES.labels(method=method).inc()
+                        await asyncio.sleep(max(e.retry_after, self.retry_backoff * (2 ** attempt)))
+                        attempt += 1
+            except Exception:
+                AI_CALLS.labels(method=method, provider=provider, outcome="error").inc()
+                raise
+            finally:
+                AI_CALL_DURATION.labels(method=method, provider=provider).observe(time.perf_counter() - started)
+        
+        AI_CALLS.labels(method=method, provider=provider, outcome="success").inc()
+        AI_TOKENS.labels(method=method, direction="in").inc(response.input_tokens)
+        AI_TOKENS.labels(method=method, direction="out").inc(response.output_tokens)
+        
+        if cache_key is not None:
+            self._cache[cache_key] = response.text
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return response.text
+    
+    @staticmethod
+    def _clusters_text(existing_clusters: Dict[str, List[str]]) -> str:
+        """Describe each cluster by its name and up to two example titles"""
+        cluster_descriptions = []
+        for name, titles in existing_clusters.items():
+            sample_titles = titles[:2] if len(titles) >= 2 else titles
+            cluster_descriptions.append(f"- {name}: (Includes ideas like: {', '.join(sample_titles)}, etc.)")
         
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('models/gemini-1.5-flash')
+        return '\n'.join(cluster_descriptions)
+    
+    @staticmethod
+    def _parse_json(response_text: str) -> Any:
+        """Strip optional markdown code fences and parse the JSON payload"""
+        response_text = response_text.strip()
+        if response_text.startswith('```json'):
+            response_text = response_text[7:-3]
+        elif response_text.startswith('```'):
+            response_text = response_text[3:-3]
+        return json.loads(response_text)
     
     async def evaluate_idea(self, idea_data: Dict[str, str], criteria: Dict[str, str]) -> Dict[str, Any]:
         """Evaluate a single idea using AI"""
@@ -51,26 +139,20 @@ class AIService:
         """
         
         try:
-            # Use synchronous call since the async version might not be available
-            response = self.model.generate_content(prompt)
-            
-            # Parse the JSON response
-            response_text = response.text.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text[7:-3]
-            elif response_text.startswith('```'):
-                response_text = response_text[3:-3]
-            
-            evaluation_result = json.loads(response_text)
+            response_text = await self._generate(prompt, "evaluate", {"idea": idea_data, "criteria": criteria})
+            evaluation_result = self._parse_json(response_text)
             return evaluation_result
         except Exception as e:
             print(f"Error in evaluate_idea: {e}")
-            # Fallback if JSON parsing fails or API call fails
+            AI_FALLBACKS.labels(method="evaluate_idea").inc()
+            # Fallback if JSON parsing fails or API call fails; flagged so it is never
+            # stored as a real evaluation
             return {
                 "summary": "AI evaluation completed but response format was unexpected.",
                 "desirability": {"score": 5, "reasoning": "Unable to parse detailed reasoning."},
                 "feasibility": {"score": 5, "reasoning": "Unable to parse detailed reasoning."},
-                "viability": {"score": 5, "reasoning": "Unable to parse detailed reasoning."}
+                "viability": {"score": 5, "reasoning": "Unable to parse detailed reasoning."},
+                "fallback": True
             }
     
     async def cluster_ideas(self, ideas: List[Dict[str, str]], config: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -98,19 +180,12 @@ class AIService:
         """
         
         try:
-            response = self.model.generate_content(prompt)
-            
-            # Clean the response text to extract JSON
-            response_text = response.text.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text[7:-3]
-            elif response_text.startswith('```'):
-                response_text = response_text[3:-3]
-            
-            clusters = json.loads(response_text)
+            response_text = await self._generate(prompt, "cluster", {"ideas": ideas, "config": config})
+            clusters = self._parse_json(response_text)
             return clusters
         except Exception as e:
             print(f"Error in cluster_ideas: {e}")
+            AI_FALLBACKS.labels(method="cluster_ideas").inc()
             # Fallback clustering if AI response fails
             cluster_size = len(ideas) // config['numberOfClusters']
             clusters = []
@@ -129,12 +204,7 @@ class AIService:
     
     async def classify_single_idea(self, idea_data: Dict[str, str], existing_clusters: Dict[str, List[str]]) -> Dict[str, Any]:
         """Classify a single idea into existing clusters or suggest a new cluster"""
-        cluster_descriptions = []
-        for name, titles in existing_clusters.items():
-            sample_titles = titles[:2] if len(titles) >= 2 else titles
-            cluster_descriptions.append(f"- {name}: (Includes ideas like: {', '.join(sample_titles)}, etc.)")
-        
-        clusters_text = '\n'.join(cluster_descriptions)
+        clusters_text = self._clusters_text(existing_clusters)
         
         prompt = f"""
         I have a new idea and I need to classify it into my existing organizational clusters.
@@ -161,22 +231,138 @@ class AIService:
         """
         
         try:
-            response = self.model.generate_content(prompt)
-            
-            # Clean the response text to extract JSON
-            response_text = response.text.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text[7:-3]
-            elif response_text.startswith('```'):
-                response_text = response_text[3:-3]
-            
-            suggestion = json.loads(response_text)
+            response_text = await self._generate(
+                prompt, "classify", {"idea": idea_data, "existing_clusters": existing_clusters}
+            )
+            suggestion = self._parse_json(response_text)
             return suggestion
         except Exception as e:
             print(f"Error in classify_single_idea: {e}")
+            AI_FALLBACKS.labels(method="classify_single_idea").inc()
             # Fallback suggestion
             return {
                 "reasoning": "Unable to parse AI response, suggesting new cluster.",
                 "suggestionType": "NEW_CLUSTER",
                 "clusterName": "Uncategorized Ideas"
-            }
\ No newline at end of file
+            }
+    
+    async def classify_idea_batch(
+        self,
+        ideas: List[Dict[str, str]],
+        existing_clusters: Dict[str, List[str]],
+        clusters_text: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Classify several ideas with one prompt, returning one suggestion per idea in input order"""
+        if clusters_text is None:
+            clusters_text = self._clusters_text(existing_clusters)
+        ideas_json = json.dumps(
+            [{"id": idea["id"], "title": idea["title"], "description": idea["description"]} for idea in ideas],
+            indent=2
+        )
+        
+        prompt = f"""
+        I have several new ideas and I need to classify each of them into my existing organizational clusters.
+
+        Here are my existing clusters and some example ideas within them:
+        {clusters_text}
+
+        Here are the new ideas to classify, in JSON format:
+        {ideas_json}
+
+        Your task, for every idea:
+        1. Analyze the idea.
+        2. Decide if it fits well into one of the existing clusters.
+        3. If it doesn't fit, suggest a new, appropriate cluster name for it. Ideas in this list that share a theme should get the same new cluster name.
+        4. Provide a brief reasoning for your decision.
+
+        Return your suggestions as a JSON array with exactly one entry per idea, using the following structure:
+        [
+            {{
+                "ideaId": "The id of the idea",
+                "reasoning": "A brief explanation for why the idea fits an existing cluster or needs a new one.",
+                "suggestionType": "EXISTING_CLUSTER" or "NEW_CLUSTER",
+                "clusterName": "The name of the suggested cluster. If it's a new cluster, provide a suitable new name."
+            }}
+        ]
+        """
+        
+        suggestions = {}
+        try:
+            response_text = await self._generate(
+                prompt, "classify_batch", {"ideas": ideas, "existing_clusters": existing_clusters}
+            )
+            for item in self._parse_json(response_text):
+                suggestion = self._validate_batch_suggestion(item)
+                if suggestion:
+                    suggestions[suggestion["ideaId"]] = suggestion
+        except Exception as e:
+            print(f"Error in classify_idea_batch: {e}")
+        
+        results = []
+        for idea in ideas:
+            suggestion = suggestions.get(idea["id"])
+            if suggestion is None:
+                AI_FALLBACKS.labels(method="classify_idea_batch").inc()
+                # Fallback suggestion for ideas the response missed
+                suggestion = {
+                    "ideaId": idea["id"],
+                    "reasoning": "Unable to parse AI response, suggesting new cluster.",
+                    "suggestionType": "NEW_CLUSTER",
+                    "clusterName": "Uncategorized Ideas",
+                    "fallback": True
+                }
+            results.append(suggestion)
+        return results
+    
+    @staticmethod
+    def _validate_batch_suggestion(item: Any) -> Optional[Dict[str, Any]]:
+        """The item as a BatchClusterSuggestion dict, or None if it does not fit the schema"""
+        if not isinstance(item, dict):
+            return None
+        if item.get("reasoning") is None:
+            item = {**item, "reasoning": "No reasoning provided."}
+        try:
+            return BatchClusterSuggestion(**{**item, "fallback": False}).dict()
+        except ValidationError as e:
+            print(f"Invalid suggestion in classify_idea_batch: {e}")
+            return None
+    
+    async def classify_ideas(
+        self,
+        ideas: List[Dict[str, str]],
+        existing_clusters: Dict[str, List[str]],
+        batch_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Classify many ideas in batched prompts that run concurrently"""
+        batch_size = batch_size or self.batch_size
+        semaphore = asyncio.Semaphore(max_concurrency or self.batch_concurrency)
+        # The cluster summary is the same for every batch, so build it once
+        clusters_text = self._clusters_text(existing_clusters)
+        
+        async def run(batch):
+            async with semaphore:
+                return await self.classify_idea_batch(batch, existing_clusters, clusters_text)
+        
+        batches = [ideas[i:i + batch_size] for i in range(0, len(ideas), batch_size)]
+        results = await asyncio.gather(*[run(batch) for batch in batches])
+        return [suggestion for batch in results for suggestion in batch]
+
+_ai_service: Optional[AIService] = None
+_ai_service_pid = None
+_ai_service_lock = threading.Lock()
+
+def get_ai_service() -> AIService:
+    """Return the process-wide AIService, creating it (and its provider client) on first use.
+
+    A service inherited through fork is rebuilt, since provider clients hold
+    network connections that must not be shared between processes.
+    """
+    global _ai_service, _ai_service_pid
+    pid = os.getpid()
+    if _ai_service is None or _ai_service_pid != pid:
+        with _ai_service_lock:
+            if _ai_service is None or _ai_service_pid != pid:
+                _ai_service = AIService()
+                _ai_service_pid = pid
+    return _ai_service
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark suite for the Idea Factory FastAPI backend.
+
+Each scale runs in its own subprocess against a fresh SQLite database seeded
+with that many ideas. The API is driven in-process through httpx with a pool
+of concurrent clients, and the AI endpoints use the deterministic fake LLM
+provider so results are reproducible without network access.
+
+Usage:
+    python benchmark.py --scales 1000,100000,1000000 --output bench_results.json
+    python benchmark.py --scales 1000 --compare bench_results.json
+"""
+
+import os
+import sys
+import csv
+import io
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+from datetime import datetime
+from typing import List, Dict, Any, Callable, Optional
+
+ENDPOINTS = ["list", "get", "top", "top-score", "vote", "upload", "save-clusters", "classify", "classify-unclustered", "evaluate"]
+
+CLUSTER_NAMES = [f"Benchmark Cluster {i}" for i in range(10)]
+
+SEED_BATCH_SIZE = 10000
+
+UPLOAD_ROWS = 100
+
+# Sample of seeded ids the request generators pick from
+SAMPLE_SIZE = 1000
+
+# Every this-many seeded ideas is left unevaluated
+UNEVALUATED_EVERY = 3
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def seed_database(scale: int, seed: int) -> List[str]:
+    """Bulk insert `scale` indexed ideas, most of them evaluated, and default criteria, returning a sample of ids"""
+    from database import get_engine, content_hash, Idea, EvaluationCriteria, EvaluationRecord, IdeaSignature, IdeaLshBucket
+    from dedup import hasher, idea_text
+    from start import initialize_database
+
+    initialize_database()
+    engine = get_engine()
+    with engine.connect() as conn:
+        criteria_version = conn.execute(EvaluationCriteria.__table__.select()).first().version
+
+    rng = random.Random(seed)
+    step = max(1, scale // SAMPLE_SIZE)
+    sample_ids = []
+    now = datetime.utcnow()
+    rows = []
+    records = []
+    signatures = []
+    buckets = []
+
+    def flush(conn):
+        for table, batch in ((Idea, rows), (EvaluationRecord, records), (IdeaSignature, signatures), (IdeaLshBucket, buckets)):
+            if batch:
+                conn.execute(table.__table__.insert(), batch)
+            batch.clear()
+
+    with engine.begin() as conn:
+        for i in range(scale):
+            idea_id = str(uuid.UUID(int=rng.getrandbits(128)))
+            if i % step == 0:
+                sample_ids.append(idea_id)
+            title = f"Idea {i}: {rng.choice(['Smart', 'Green', 'Open', 'Social'])} {rng.choice(['Platform', 'Device', 'Service', 'Marketplace'])}"
+            description = " ".join(rng.choice(["users", "data", "energy", "health", "city", "mobile", "cloud", "local"]) for _ in range(30))
+            row = {
+                "id": idea_id,
+                "title": title,
+                "description": description,
+                "content_hash": content_hash(title, description),
+                "status": "PUBLISHED" if i % 2 else "DRAFT",
+                "votes": rng.randint(0, 50),
+                "cluster_name": CLUSTER_NAMES[i % len(CLUSTER_NAMES)] if i % 3 else None,
+                "created_at": now,
+                "updated_at": now,
+                # executemany needs the same keys in every row
+                "current_evaluation_id": None,
+                "desirability_score": None,
+                "feasibility_score": None,
+                "viability_score": None,
+                "evaluation_criteria_version": None,
+                "evaluation_content_hash": None,
+                "composite_score": None,
+            }
+            if i % UNEVALUATED_EVERY:
+                scores = [float(rng.randint(1, 10)) for _ in range(3)]
+                records.append({
+                    "id": i + 1,
+                    "idea_id": idea_id,
+                    "criteria_version": criteria_version,
+                    "content_hash": row["content_hash"],
+                    "summary": "Benchmark evaluation",
+                    "desirability_score": scores[0],
+                    "desirability_reasoning": "Seeded",
+                    "feasibility_score": scores[1],
+                    "feasibility_reasoning": "Seeded",
+                    "viability_score": scores[2],
+                    "viability_reasoning": "Seeded",
+                    "fallback": False,
+                    "created_at": now,
+                })
+                # Default weights are equal, so the composite is the plain average
+                row.update({
+                    "current_evaluation_id": i + 1,
+                    "desirability_score": scores[0],
+                    "feasibility_score": scores[1],
+                    "viability_score": scores[2],
+                    "evaluation_criteria_version": criteria_version,
+                    "evaluation_content_hash": row["content_hash"],
+                    "composite_score": sum(scores) / 3,
+                })
+            rows.append(row)
+            # initialize_database() ran before these rows existed, so index them here
+            signature = hasher.signature(idea_text(title, description))
+            signatures.append({"idea_id": idea_id, "signature": hasher.pack(signature)})
+            buckets.extend({"bucket": bucket, "idea_id": idea_id} for bucket in set(hasher.band_buckets(signature)))
+            if len(rows) >= SEED_BATCH_SIZE:
+                flush(conn)
+        if rows:
+            flush(conn)
+    return sample_ids
+
+def build_request_factories(sample_ids: List[str], rng: random.Random) -> Dict[str, Callable[[], Dict[str, Any]]]:
+    """Map each endpoint name to a function producing httpx request kwargs"""
+
+    def upload_request() -> Dict[str, Any]:
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=["title", "description"])
+        writer.writeheader()
+        for i in range(UPLOAD_ROWS):
+            writer.writerow({"title": f"Uploaded idea {rng.random()}", "description": f"Uploaded description {i}"})
+        return {
+            "method": "POST",
+            "url": "/api/ideas/upload",
+            "files": {"file": ("ideas.csv", buffer.getvalue().encode("utf-8"), "text/csv")},
+        }
+
+    def save_clusters_request() -> Dict[str, Any]:
+        ids = rng.sample(sample_ids, min(100, len(sample_ids)))
+        clusters = [
+            {"clusterName": name, "clusterDescription": "Benchmark", "ideaIds": ids[i::len(CLUSTER_NAMES)]}
+            for i, name in enumerate(CLUSTER_NAMES)
+        ]
+        return {"method": "POST", "url": "/api/ideas/save-clusters", "json": clusters}
+
+    return {
+        "list": lambda: {"method": "GET", "url": "/api/ideas"},
+        "get": lambda: {"method": "GET", "url": f"/api/ideas/{rng.choice(sample_ids)}"},
+        "top": lambda: {"method": "GET", "url": "/api/ideas/top?by=votes&k=10"},
+        "top-score": lambda: {"method": "GET", "url": "/api/ideas/top?by=score&k=10"},
+        "vote": lambda: {"method": "POST", "url": f"/api/ideas/{rng.choice(sample_ids)}/vote"},
+        "upload": upload_request,
+        "save-clusters": save_clusters_request,
+        "classify": lambda: {"method": "POST", "url": f"/api/ideas/{rng.choice(sample_ids)}/classify"},
+        "classify-unclustered": lambda: {"method": "POST", "url": "/api/ideas/classify-unclustered", "json": {"limit": 100}},
+        "evaluate": lambda: {"method": "POST", "url": "/api/ideas/evaluate", "json": {"idea_ids": [rng.choice(sample_ids)]}},
+    }
+
+async def drive(client, make_request: Callable[[], Dict[str, Any]], total: int, concurrency: int) -> Dict[str, Any]:
+    """Send `total` requests from `concurrency` clients and collect latencies"""
+    latencies = []
+    errors = 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            request = make_request()
+            started = time.perf_counter()
+            response = await client.request(**request)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(min(concurrency, total))])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+    }
+
+async def run_scale(args) -> Dict[str, Any]:
+    """Seed one database and benchmark every selected endpoint against it"""
+    import httpx
+
+    seed_started = time.perf_counter()
+    sample_ids = seed_database(args.scale, args.seed)
+    seed_elapsed = time.perf_counter() - seed_started
+
+    from main import app
+
+    rng = random.Random(args.seed)
+    factories = build_request_factories(sample_ids, rng)
+    results = {}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        for endpoint in args.endpoints:
+            # Listing the whole table is orders of magnitude heavier than the rest
+            total = max(1, args.requests // 20) if endpoint == "list" else args.requests
+
+            # Warm up caches and lazy initialisation outside of the measurement
+            await client.request(**factories[endpoint]())
+
+            result = await drive(client, factories[endpoint], total, args.concurrency)
+
+            # Separate, shorter pass for memory: tracemalloc slows every allocation
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+            await drive(client, factories[endpoint], min(total, args.memory_requests), args.concurrency)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            result["memory_peak_mb"] = peak / (1024 * 1024)
+
+            results[endpoint] = result
+            print(
+                f"[{args.scale}] {endpoint:<14} {result['throughput_rps']:9.1f} req/s  "
+                f"p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  "
+                f"p99 {result['p99_ms']:8.2f} ms  peak {result['memory_peak_mb']:7.1f} MB  "
+                f"errors {result['errors']}",
+                file=sys.stderr,
+            )
+
+    return {"scale": args.scale, "seed_s": seed_elapsed, "endpoints": results}
+
+def run_worker(args) -> None:
+    """Entry point of the per-scale subprocess; prints its results as JSON"""
+    result = asyncio.run(run_scale(args))
+    print(json.dumps(result))
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, text=True,
+        ).strip()
+    except Exception:
+        return None
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """List endpoints whose p95 latency or throughput regressed beyond `threshold`"""
+    regressions = []
+    baseline_scales = {run["scale"]: run for run in baseline.get("runs", [])}
+    for run in current["runs"]:
+        previous = baseline_scales.get(run["scale"])
+        if not previous:
+            continue
+        for endpoint, result in run["endpoints"].items():
+            before = previous["endpoints"].get(endpoint)
+            if not before:
+                continue
+            if before["p95_ms"] and result["p95_ms"] > before["p95_ms"] * (1 + threshold):
+                regressions.append(
+                    f"{run['scale']} {endpoint}: p95 {before['p95_ms']:.2f} -> {result['p95_ms']:.2f} ms"
+                )
+            if result["throughput_rps"] < before["throughput_rps"] * (1 - threshold):
+                regressions.append(
+                    f"{run['scale']} {endpoint}: throughput {before['throughput_rps']:.1f} -> {result['throughput_rps']:.1f} req/s"
+                )
+    return regressions
+
+def run_all(args) -> int:
+    """Spawn one subprocess per scale and collect the results"""
+    runs = []
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ)
+            env["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'benchmark.db')}"
+            env["AI_PROVIDER"] = "fake"
+            env["FAKE_LLM_LATENCY_MS"] = str(args.fake_latency_ms)
+            env["FAKE_LLM_SEED"] = str(args.seed)
+            command = [
+                sys.executable, os.path.abspath(__file__), "--worker",
+                "--scale", str(scale),
+                "--requests", str(args.requests),
+                "--concurrency", str(args.concurrency),
+                "--memory-requests", str(args.memory_requests),
+                "--endpoints", ",".join(args.endpoints),
+                "--seed", str(args.seed),
+            ]
+            completed = subprocess.run(
+                command, env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+                stdout=subprocess.PIPE, text=True,
+            )
+            if completed.returncode != 0:
+                print(f"[ERROR] Benchmark at scale {scale} failed", file=sys.stderr)
+                return completed.returncode
+            runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "memory_requests": args.memory_requests,
+            "fake_latency_ms": args.fake_latency_ms,
+            "seed": args.seed,
+        },
+        "runs": runs,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[OK] Results written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for line in regressions:
+            print(f"[REGRESSION] {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("[OK] No regressions against baseline", file=sys.stderr)
+    return 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Idea Factory API")
+    parser.add_argument("--scales", default="1000,100000,1000000",
+                        help="Comma separated idea counts to seed (default: 1000,100000,1000000)")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS),
+                        help=f"Comma separated endpoints to drive (default: {','.join(ENDPOINTS)})")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint (list uses 1/20th)")
+    # Sessions keep their pooled connection until dependency teardown, so more
+    # clients than the engine's pool (5 + 10 overflow) stall the event loop
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--memory-requests", type=int, default=20, help="Requests in the tracemalloc pass")
+    parser.add_argument("--fake-latency-ms", type=float, default=0.0, help="Mean latency of the fake LLM")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write machine-readable results to this JSON file")
+    parser.add_argument("--compare", help="Baseline results JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Relative change counted as a regression (default: 0.2)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--scale", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    args.scales = [int(s) for s in args.scales.split(",") if s]
+    args.endpoints = [e for e in args.endpoints.split(",") if e]
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+    return args
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.worker:
+        run_worker(args)
+    else:
+        sys.exit(run_all(args))
@@ -0,0 +1,158 @@
+"""
+Bounded in-process LRU caches for hot reads, with explicit invalidation.
+
+Writers invalidate after committing. Every invalidation bumps the cache's
+version, and a value read from the database is only stored if no invalidation
+happened while it was being read, so a slow reader cannot put a stale value back.
+
+With several workers set CACHE_INVALIDATION=db: invalidations are then also
+written to the cache_invalidations table, and each worker applies the ones made
+by other workers at most CACHE_POLL_SECONDS later. Rows are pruned after
+CHANNEL_RETENTION; a worker that finds rows missing since its last poll clears
+all of its caches instead of trusting them.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+from sqlalchemy import delete, func, insert, select
+
+from database import get_engine, CacheInvalidation
+from metrics import CACHE_REQUESTS, CACHE_INVALIDATIONS
+
+IDEA_CACHE_SIZE = int(os.getenv("IDEA_CACHE_SIZE", "1024"))
+
+CACHE_INVALIDATION = os.getenv("CACHE_INVALIDATION", "local").lower()
+CACHE_POLL_SECONDS = float(os.getenv("CACHE_POLL_SECONDS", "1"))
+
+# Invalidation rows are pruned once this old; a worker that has not polled
+# for that long notices the gap and clears its caches
+CHANNEL_RETENTION = timedelta(minutes=10)
+
+CACHES: Dict[str, "LRUCache"] = {}
+
+class LRUCache:
+    """Least-recently-used cache holding at most `maxsize` entries (0 disables it)"""
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.maxsize = maxsize
+        self.version = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        CACHES[name] = self
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        channel.poll()
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+        CACHE_REQUESTS.labels(cache=self.name, result="hit" if value is not None else "miss").inc()
+        return value
+
+    def set(self, key: Hashable, value: Any, version: int):
+        """Store a value read while the cache was at `version`; dropped if invalidated since"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *keys: Hashable):
+        """Drop `keys` here and in other workers"""
+        if not keys:
+            return
+        self.invalidate_local(keys)
+        channel.publish(self.name, keys)
+
+    def clear(self):
+        """Drop every entry here and in other workers"""
+        self.invalidate_local(None)
+        channel.publish(self.name, None)
+
+    def invalidate_local(self, keys: Optional[Iterable[Hashable]], source: str = "local"):
+        with self._lock:
+            self.version += 1
+            if keys is None:
+                self._entries.clear()
+            else:
+                for key in keys:
+                    self._entries.pop(key, None)
+        CACHE_INVALIDATIONS.labels(cache=self.name, source=source).inc()
+
+class DatabaseChannel:
+    """Cross-worker invalidation through a table every worker polls"""
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self._last_id = None
+        self._next_poll = 0.0
+        self._next_prune = 0.0
+        self._lock = threading.Lock()
+
+    def publish(self, cache: str, keys: Optional[Iterable[Hashable]]):
+        if not self.enabled:
+            return
+        now = datetime.utcnow()
+        rows = [{"cache": cache, "key": None, "origin": os.getpid(), "created_at": now}] if keys is None else [
+            {"cache": cache, "key": str(key), "origin": os.getpid(), "created_at": now} for key in keys
+        ]
+        if not rows:
+            return
+        try:
+            with get_engine().begin() as conn:
+                conn.execute(insert(CacheInvalidation), rows)
+                if time.monotonic() >= self._next_prune:
+                    self._next_prune = time.monotonic() + CHANNEL_RETENTION.total_seconds() / 10
+                    conn.execute(delete(CacheInvalidation).where(CacheInvalidation.created_at < now - CHANNEL_RETENTION))
+        except Exception as e:
+            print(f"Error publishing cache invalidation: {e}")
+
+    def poll(self):
+        if not self.enabled or time.monotonic() < self._next_poll:
+            return
+        with self._lock:
+            if time.monotonic() < self._next_poll:
+                return
+            self._next_poll = time.monotonic() + CACHE_POLL_SECONDS
+            try:
+                with get_engine().connect() as conn:
+                    if self._last_id is None:
+                        # Nothing is cached yet, so only later invalidations matter
+                        self._last_id = conn.execute(select(func.max(CacheInvalidation.id))).scalar() or 0
+                        return
+                    rows = conn.execute(
+                        select(CacheInvalidation.id, CacheInvalidation.cache, CacheInvalidation.key, CacheInvalidation.origin)
+                        .where(CacheInvalidation.id > self._last_id)
+                        .order_by(CacheInvalidation.id)
+                    ).all()
+            except Exception as e:
+                print(f"Error polling cache invalidations: {e}")
+                return
+            if rows and rows[0].id > self._last_id + 1:
+                # Invalidations this worker never saw were pruned, so nothing cached can be trusted
+                for cache in CACHES.values():
+                    cache.invalidate_local(None, source="gap")
+                self._last_id = rows[-1].id
+                return
+            for row in rows:
+                self._last_id = row.id
+                cache = CACHES.get(row.cache)
+                if cache is None or row.origin == os.getpid():
+                    continue
+                cache.invalidate_local(None if row.key is None else [row.key], source="remote")
+
+channel = DatabaseChannel(CACHE_INVALIDATION == "db")
+
+# Detail responses by idea id, and the current evaluation criteria
+idea_cache = LRUCache("idea", IDEA_CACHE_SIZE)
+criteria_cache = LRUCache("criteria", 1)
@@ -1,16 +1,50 @@
-from sqlalchemy import create_engine, Column, String, Integer, Float, Boolean, Text, DateTime
+from sqlalchemy import create_engine, event, inspect, text, select, update, bindparam, Column, String, Integer, BigInteger, Float, Boolean, Text, DateTime, LargeBinary
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
 from datetime import datetime
 import os
+import hashlib
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./idea_factory.db")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# The engine is created on first use in each process rather than at import
+# time, so importing the app stays cheap and forked workers never share the
+# parent's pooled connections.
+_engine = None
+_engine_pid = None
+_engine_lock = threading.Lock()
+_tables_ready = False
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+def _enable_sqlite_wal(dbapi_connection, connection_record):
+    # WAL lets readers in other worker processes proceed while one writes
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
+def get_engine() -> Engine:
+    global _engine, _engine_pid
+    pid = os.getpid()
+    if _engine is not None and _engine_pid == pid:
+        return _engine
+    with _engine_lock:
+        if _engine is None:
+            connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+            _engine = create_engine(DATABASE_URL, connect_args=connect_args)
+            if DATABASE_URL.startswith("sqlite") and ":memory:" not in DATABASE_URL:
+                event.listen(_engine, "connect", _enable_sqlite_wal)
+            SessionLocal.configure(bind=_engine)
+        elif _engine_pid != pid:
+            # Inherited through fork: forget the parent's connections without closing them
+            _engine.dispose(close=False)
+        _engine_pid = pid
+    return _engine
 
 Base = declarative_base()
 
@@ -21,37 +55,231 @@ class Idea(Base):
     title = Column(String, index=True)
     description = Column(Text)
     status = Column(String, default="DRAFT")  # DRAFT or PUBLISHED
-    votes = Column(Integer, default=0)
+    votes = Column(Integer, default=0, index=True)
     cluster_name = Column(String, nullable=True)
-    is_evaluating = Column(Boolean, default=False)
-    is_classifying = Column(Boolean, default=False)
+    # Expiring leases held while an idea is being evaluated or classified (see leases.py)
+    evaluation_lease_token = Column(String, nullable=True)
+    evaluation_lease_expires_at = Column(DateTime, nullable=True)
+    classification_lease_token = Column(String, nullable=True)
+    classification_lease_expires_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    content_hash = Column(String, nullable=True)  # hash of title + description, kept current on write
+    duplicate_of = Column(String, nullable=True, index=True)  # canonical idea this one near-duplicates
     
-    # AI Evaluation fields
-    evaluation_summary = Column(Text, nullable=True)
+    # AI Evaluation fields. Only the scores live on the row; the summary and
+    # reasoning text is in idea_evaluations and loaded for detail views only.
+    current_evaluation_id = Column(Integer, nullable=True)  # latest EvaluationRecord
     desirability_score = Column(Float, nullable=True)
-    desirability_reasoning = Column(Text, nullable=True)
     feasibility_score = Column(Float, nullable=True)
-    feasibility_reasoning = Column(Text, nullable=True)
     viability_score = Column(Float, nullable=True)
-    viability_reasoning = Column(Text, nullable=True)
+    evaluation_criteria_version = Column(Integer, nullable=True)  # criteria version the scores came from
+    evaluation_content_hash = Column(String, nullable=True)  # content_hash at evaluation time
+    composite_score = Column(Float, nullable=True, index=True)  # weighted average of the three scores
+
+class EvaluationRecord(Base):
+    """One AI evaluation of an idea; earlier evaluations are kept as history"""
+    __tablename__ = "idea_evaluations"
+    
+    id = Column(Integer, primary_key=True)
+    idea_id = Column(String, index=True)
+    criteria_version = Column(Integer, nullable=True)
+    content_hash = Column(String, nullable=True)  # idea content_hash the evaluation was based on
+    summary = Column(Text)
+    desirability_score = Column(Float)
+    desirability_reasoning = Column(Text)
+    feasibility_score = Column(Float)
+    feasibility_reasoning = Column(Text)
+    viability_score = Column(Float)
+    viability_reasoning = Column(Text)
+    fallback = Column(Boolean, default=False)  # placeholder returned when the AI call failed
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class IdeaSignature(Base):
+    """MinHash signature of an idea's title and description"""
+    __tablename__ = "idea_signatures"
+    
+    idea_id = Column(String, primary_key=True)
+    signature = Column(LargeBinary)
+
+class IdeaLshBucket(Base):
+    """LSH band buckets; ideas sharing a bucket are near-duplicate candidates"""
+    __tablename__ = "idea_lsh_buckets"
+    
+    bucket = Column(BigInteger, primary_key=True)
+    idea_id = Column(String, primary_key=True, index=True)
+
+class ScoringWeights(Base):
+    """Weights of the three criteria in the composite score (single row)"""
+    __tablename__ = "scoring_weights"
+    
+    id = Column(Integer, primary_key=True)
+    desirability = Column(Float, default=1.0)
+    feasibility = Column(Float, default=1.0)
+    viability = Column(Float, default=1.0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class EvaluationCriteria(Base):
     __tablename__ = "evaluation_criteria"
     
     id = Column(Integer, primary_key=True, index=True)
+    version = Column(Integer, index=True, unique=True)  # every edit is stored as a new, higher version
     desirability = Column(Text)
     feasibility = Column(Text)
     viability = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class CacheInvalidation(Base):
+    """Cache invalidations broadcast to other worker processes (see cache.py)"""
+    __tablename__ = "cache_invalidations"
+    
+    id = Column(Integer, primary_key=True)
+    cache = Column(String)
+    key = Column(String, nullable=True)  # None clears the whole cache
+    origin = Column(Integer)  # pid of the worker that made the change
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+def content_hash(title: str, description: str) -> str:
+    """Hash of the fields an evaluation is based on"""
+    return hashlib.sha256(f"{title}\n{description}".encode("utf-8")).hexdigest()
+
+def migrate_schema(engine: Engine):
+    """Bring databases created by older versions up to date.
+
+    create_all only creates missing tables, so new nullable columns are added
+    with ALTER TABLE and missing indexes are created, then backfilled.
+    """
+    inspector = inspect(engine)
+    idea_columns = {column["name"] for column in inspector.get_columns("ideas")}
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+        # Rows written before criteria were versioned
+        conn.execute(text("UPDATE evaluation_criteria SET version = id WHERE version IS NULL"))
+        _make_criteria_versions_unique(conn, inspector)
+
+        if "evaluation_summary" in idea_columns:
+            _move_inline_evaluations(conn)
+        _flag_fallback_evaluations(conn)
+
+        ideas = Idea.__table__
+        while True:
+            rows = conn.execute(
+                select(ideas.c.id, ideas.c.title, ideas.c.description)
+                .where(ideas.c.content_hash.is_(None))
+                .limit(1000)
+            ).all()
+            if not rows:
+                break
+            conn.execute(
+                update(ideas).where(ideas.c.id == bindparam("_id")).values(content_hash=bindparam("_hash")),
+                [{"_id": row.id, "_hash": content_hash(row.title, row.description)} for row in rows],
+            )
+
+_REASONING_COLUMNS = ("desirability_reasoning", "feasibility_reasoning", "viability_reasoning")
+
+def _move_inline_evaluations(conn):
+    """Copy evaluations stored inline on ideas into idea_evaluations, then clear the wide columns"""
+    conn.execute(text(
+        "INSERT INTO idea_evaluations (idea_id, criteria_version, content_hash, summary, "
+        "desirability_score, desirability_reasoning, feasibility_score, feasibility_reasoning, "
+        "viability_score, viability_reasoning, created_at) "
+        "SELECT id, evaluation_criteria_version, evaluation_content_hash, evaluation_summary, "
+        "desirability_score, desirability_reasoning, feasibility_score, feasibility_reasoning, "
+        "viability_score, viability_reasoning, updated_at "
+        "FROM ideas WHERE evaluation_summary IS NOT NULL AND current_evaluation_id IS NULL"
+    ))
+    conn.execute(text(
+        "UPDATE ideas SET current_evaluation_id = "
+        "(SELECT MAX(e.id) FROM idea_evaluations e WHERE e.idea_id = ideas.id) "
+        "WHERE evaluation_summary IS NOT NULL AND current_evaluation_id IS NULL"
+    ))
+    cleared = ", ".join(f"{column} = NULL" for column in ("evaluation_summary",) + _REASONING_COLUMNS)
+    conn.execute(text(f"UPDATE ideas SET {cleared} WHERE evaluation_summary IS NOT NULL"))
+
+def _make_criteria_versions_unique(conn, inspector):
+    """Replace the non-unique version index of older databases with a unique one"""
+    index = next(index for index in EvaluationCriteria.__table__.indexes if "version" in index.columns)
+    existing = {i["name"]: i for i in inspector.get_indexes("evaluation_criteria")}
+    if index.name in existing and existing[index.name]["unique"]:
+        return
+    if index.name in existing:
+        conn.execute(text(f"DROP INDEX {index.name}"))
+    # Concurrent saves could give two rows the same version: the later ones move
+    # past the highest version, so ideas evaluated against them show up as stale
+    conn.execute(text(
+        "UPDATE evaluation_criteria SET version = id + (SELECT MAX(version) FROM evaluation_criteria) "
+        "WHERE id NOT IN (SELECT MIN(id) FROM evaluation_criteria GROUP BY version)"
+    ))
+    index.create(conn)
+
+# Summary of the placeholder AIService.evaluate_idea returns when the AI call fails
+_FALLBACK_SUMMARY = "AI evaluation completed but response format was unexpected."
+
+def _flag_fallback_evaluations(conn):
+    """Flag placeholders stored as evaluations by older versions and unset them as current"""
+    records = EvaluationRecord.__table__
+    conn.execute(
+        update(records)
+        .where(records.c.fallback.is_(None))
+        .values(fallback=records.c.summary == _FALLBACK_SUMMARY)
+    )
+    ideas = Idea.__table__
+    conn.execute(
+        update(ideas)
+        .where(ideas.c.current_evaluation_id.in_(select(records.c.id).where(records.c.fallback == True)))  # noqa: E712
+        .values(
+            current_evaluation_id=None,
+            desirability_score=None,
+            feasibility_score=None,
+            viability_score=None,
+            evaluation_criteria_version=None,
+            evaluation_content_hash=None,
+            composite_score=None,
+        )
+    )
+
 def create_tables():
+    global _tables_ready
+    engine = get_engine()
     Base.metadata.create_all(bind=engine)
+    migrate_schema(engine)
+    _tables_ready = True
+
+def init_db():
+    """Create tables once per process"""
+    if not _tables_ready:
+        create_tables()
+
+def ping_db() -> bool:
+    """Check that the database answers a trivial query"""
+    try:
+        with get_engine().connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    except Exception as e:
+        print(f"Database ping failed: {e}")
+        return False
+
+def tables_ready() -> bool:
+    return _tables_ready
+
+def create_session() -> Session:
+    get_engine()
+    return SessionLocal()
 
 def get_db():
-    db = SessionLocal()
+    db = create_session()
     try:
         yield db
     finally:
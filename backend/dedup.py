@@ -0,0 +1,278 @@
+"""
+Near-duplicate detection for ideas using MinHash signatures and LSH banding.
+
+Signatures and band buckets are stored in the database, so a lookup is a few
+indexed bucket queries (sublinear in the number of ideas) and every worker
+process sees the same index.
+"""
+
+import os
+import re
+import random
+import struct
+import hashlib
+from collections import defaultdict
+from typing import List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from database import Idea, IdeaSignature, IdeaLshBucket
+
+# Supported values of DUPLICATE_POLICY and the per-request override
+DUPLICATE_POLICIES = ("allow", "reject", "merge", "link")
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+def _mod_mersenne(x: np.ndarray) -> np.ndarray:
+    """x mod 2**61 - 1 for uint64 values below 2**63"""
+    prime = np.uint64(_MERSENNE_PRIME)
+    x = (x & prime) + (x >> np.uint64(61))
+    return np.where(x >= prime, x - prime, x)
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+class MinHasher:
+    """MinHash over character shingles with `bands` x `rows` LSH banding"""
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, shingle_size: int = 5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = random.Random(seed)
+        self._perms = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+        # Multipliers split at bit 32 so every product fits in 64 bits
+        a = np.array([a for a, _ in self._perms], dtype=np.uint64)[:, None]
+        self._a_high = a >> np.uint64(32)
+        self._a_low = a & np.uint64(_MAX_HASH)
+        self._b = np.array([b for _, b in self._perms], dtype=np.uint64)[:, None]
+
+    def shingles(self, text: str) -> Set[int]:
+        normalized = _NON_WORD.sub(" ", text.lower()).strip()
+        if len(normalized) <= self.shingle_size:
+            grams = {normalized}
+        else:
+            grams = {normalized[i:i + self.shingle_size] for i in range(len(normalized) - self.shingle_size + 1)}
+        return {
+            int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=4).digest(), "little")
+            for gram in grams
+        }
+
+    def signature(self, text: str) -> List[int]:
+        """min over shingles of ((a * h + b) mod 2**61 - 1) & 0xFFFFFFFF per permutation"""
+        h = np.fromiter(self.shingles(text), dtype=np.uint64)[None, :]
+        # a * h = a_high * h * 2**32 + a_low * h, and 2**61 = 1 modulo the prime
+        high = self._a_high * h
+        high = (high >> np.uint64(29)) + ((high & np.uint64((1 << 29) - 1)) << np.uint64(32))
+        low = _mod_mersenne(self._a_low * h)
+        values = _mod_mersenne(high + low + self._b) & np.uint64(_MAX_HASH)
+        return values.min(axis=1).tolist()
+
+    def band_buckets(self, signature: List[int]) -> List[int]:
+        """One signed 64-bit bucket key per band, with the band index mixed in"""
+        buckets = []
+        for band in range(self.bands):
+            values = signature[band * self.rows:(band + 1) * self.rows]
+            digest = hashlib.blake2b(struct.pack(f"<I{self.rows}I", band, *values), digest_size=8).digest()
+            buckets.append(int.from_bytes(digest, "little", signed=True))
+        return buckets
+
+    @staticmethod
+    def similarity(a: List[int], b: List[int]) -> float:
+        """Estimated Jaccard similarity of the two shingle sets"""
+        return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+    def similarities(self, signature: List[int], packed: List[bytes]) -> np.ndarray:
+        """similarity() of `signature` against each packed signature"""
+        matrix = np.frombuffer(b"".join(packed), dtype="<u4").reshape(len(packed), self.num_perm)
+        return (matrix == np.array(signature, dtype=np.uint32)).mean(axis=1)
+
+    def pack(self, signature: List[int]) -> bytes:
+        return struct.pack(f"<{self.num_perm}I", *signature)
+
+    def unpack(self, data: bytes) -> List[int]:
+        return list(struct.unpack(f"<{self.num_perm}I", data))
+
+hasher = MinHasher()
+
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.8"))
+
+# Upper bound on candidates verified per lookup, so very common buckets stay cheap
+MAX_CANDIDATES = 200
+
+# Values per IN (...) list in batched lookups
+LOOKUP_BATCH_SIZE = 500
+
+def default_policy() -> str:
+    policy = os.getenv("DUPLICATE_POLICY", "link").lower()
+    if policy not in DUPLICATE_POLICIES:
+        raise ValueError(f"Unknown DUPLICATE_POLICY: {policy}")
+    return policy
+
+def idea_text(title: str, description: str) -> str:
+    return f"{title} {description}"
+
+def find_duplicate(
+    db: Session, signature: List[int], exclude_id: Optional[str] = None, threshold: float = None
+) -> Optional[Tuple[Idea, float]]:
+    """Return the canonical idea most similar to `signature`, if any reaches the threshold"""
+    threshold = DUPLICATE_THRESHOLD if threshold is None else threshold
+    candidate_ids = (
+        db.query(IdeaLshBucket.idea_id)
+        .filter(IdeaLshBucket.bucket.in_(hasher.band_buckets(signature)))
+        .distinct()
+        .limit(MAX_CANDIDATES)
+    )
+    rows = [
+        row for row in
+        db.query(IdeaSignature.idea_id, IdeaSignature.signature).filter(IdeaSignature.idea_id.in_(candidate_ids))
+        if row.idea_id != exclude_id
+    ]
+    if not rows:
+        return None
+
+    similarities = hasher.similarities(signature, [row.signature for row in rows])
+    best = int(similarities.argmax())
+    best_id, best_similarity = rows[best].idea_id, float(similarities[best])
+    if best_similarity < threshold:
+        return None
+
+    idea = db.query(Idea).filter(Idea.id == best_id).first()
+    if idea and idea.duplicate_of:
+        # Always point at the root of a duplicate chain
+        canonical = db.query(Idea).filter(Idea.id == idea.duplicate_of).first()
+        idea = canonical or idea
+    if not idea or idea.id == exclude_id:
+        return None
+    return idea, best_similarity
+
+def stored_similarity(db: Session, idea_id: str, other_id: str) -> Optional[float]:
+    """Similarity of two ideas' current signatures, or None if either is not indexed"""
+    packed = {
+        row.idea_id: row.signature
+        for row in db.query(IdeaSignature.idea_id, IdeaSignature.signature).filter(IdeaSignature.idea_id.in_([idea_id, other_id]))
+    }
+    if idea_id not in packed or other_id not in packed:
+        return None
+    return hasher.similarity(hasher.unpack(packed[idea_id]), hasher.unpack(packed[other_id]))
+
+def find_duplicates(
+    db: Session, signatures: List[List[int]], threshold: float = None
+) -> List[Optional[Tuple[str, float]]]:
+    """find_duplicate for many signatures at once, returning (canonical id, similarity) or None for each"""
+    threshold = DUPLICATE_THRESHOLD if threshold is None else threshold
+    row_buckets = [hasher.band_buckets(signature) for signature in signatures]
+    members = defaultdict(list)
+    for values in _batches(sorted({bucket for buckets in row_buckets for bucket in buckets})):
+        for row in db.query(IdeaLshBucket.bucket, IdeaLshBucket.idea_id).filter(IdeaLshBucket.bucket.in_(values)):
+            members[row.bucket].append(row.idea_id)
+    candidates = [
+        list(dict.fromkeys(idea_id for bucket in buckets for idea_id in members.get(bucket, ())))[:MAX_CANDIDATES]
+        for buckets in row_buckets
+    ]
+
+    packed = {}
+    for ids in _batches(sorted({idea_id for ids in candidates for idea_id in ids})):
+        for row in db.query(IdeaSignature.idea_id, IdeaSignature.signature).filter(IdeaSignature.idea_id.in_(ids)):
+            packed[row.idea_id] = row.signature
+    matches = []
+    for signature, ids in zip(signatures, candidates):
+        ids = [idea_id for idea_id in ids if idea_id in packed]
+        match = None
+        if ids:
+            similarities = hasher.similarities(signature, [packed[idea_id] for idea_id in ids])
+            best = int(similarities.argmax())
+            if similarities[best] >= threshold:
+                match = (ids[best], float(similarities[best]))
+        matches.append(match)
+
+    # Always point at the root of a duplicate chain
+    roots = {}
+    for ids in _batches(sorted({match[0] for match in matches if match})):
+        for row in db.query(Idea.id, Idea.duplicate_of).filter(Idea.id.in_(ids)):
+            roots[row.id] = row.duplicate_of or row.id
+    return [(roots[match[0]], match[1]) if match and match[0] in roots else None for match in matches]
+
+def _batches(values: list):
+    for start in range(0, len(values), LOOKUP_BATCH_SIZE):
+        yield values[start:start + LOOKUP_BATCH_SIZE]
+
+def index_idea(db: Session, idea_id: str, signature: List[int], replace: bool = True):
+    """Add (or replace) an idea's signature and band buckets; pass replace=False for new ideas"""
+    if replace:
+        unindex_idea(db, idea_id)
+    db.add(IdeaSignature(idea_id=idea_id, signature=hasher.pack(signature)))
+    db.add_all(IdeaLshBucket(bucket=bucket, idea_id=idea_id) for bucket in set(hasher.band_buckets(signature)))
+
+def unindex_idea(db: Session, idea_id: str):
+    db.query(IdeaSignature).filter(IdeaSignature.idea_id == idea_id).delete(synchronize_session=False)
+    db.query(IdeaLshBucket).filter(IdeaLshBucket.idea_id == idea_id).delete(synchronize_session=False)
+
+class BatchIndex:
+    """In-memory LSH index of ideas added by one request and not written yet.
+
+    A batch checks each row against the earlier rows without flushing them,
+    then writes every signature and bucket in one insert per table.
+    """
+
+    def __init__(self):
+        self._signatures = {}
+        self._canonical = {}
+        self._buckets = defaultdict(list)
+
+    def add(self, idea_id: str, signature: List[int], canonical_id: Optional[str] = None):
+        self._signatures[idea_id] = signature
+        self._canonical[idea_id] = canonical_id or idea_id
+        for bucket in set(hasher.band_buckets(signature)):
+            self._buckets[bucket].append(idea_id)
+
+    def find(self, signature: List[int], threshold: float = None) -> Optional[Tuple[str, float]]:
+        """Return the canonical id of the most similar idea in the batch and its similarity"""
+        threshold = DUPLICATE_THRESHOLD if threshold is None else threshold
+        candidates = []
+        for bucket in hasher.band_buckets(signature):
+            candidates.extend(self._buckets.get(bucket, ()))
+        best_id, best_similarity = None, 0.0
+        for idea_id in list(dict.fromkeys(candidates))[:MAX_CANDIDATES]:
+            similarity = hasher.similarity(signature, self._signatures[idea_id])
+            if similarity > best_similarity:
+                best_id, best_similarity = idea_id, similarity
+        if best_id is None or best_similarity < threshold:
+            return None
+        return self._canonical[best_id], best_similarity
+
+    def write(self, db: Session):
+        db.bulk_insert_mappings(IdeaSignature, [
+            {"idea_id": idea_id, "signature": hasher.pack(signature)}
+            for idea_id, signature in self._signatures.items()
+        ])
+        db.bulk_insert_mappings(IdeaLshBucket, [
+            {"bucket": bucket, "idea_id": idea_id}
+            for bucket, idea_ids in self._buckets.items()
+            for idea_id in idea_ids
+        ])
+
+def index_missing_ideas(db: Session, batch_size: int = 1000) -> int:
+    """Index ideas created before duplicate detection existed"""
+    indexed = 0
+    while True:
+        ideas = (
+            db.query(Idea.id, Idea.title, Idea.description)
+            .outerjoin(IdeaSignature, IdeaSignature.idea_id == Idea.id)
+            .filter(IdeaSignature.idea_id.is_(None))
+            .limit(batch_size)
+            .all()
+        )
+        if not ideas:
+            return indexed
+        for idea in ideas:
+            index_idea(db, idea.id, hasher.signature(idea_text(idea.title or "", idea.description or "")))
+        db.commit()
+        indexed += len(ideas)
@@ -0,0 +1,173 @@
+"""
+Streaming export of ideas as CSV, NDJSON or Parquet.
+
+Rows are read with a server-side cursor in batches of EXPORT_BATCH_SIZE and
+encoded batch by batch, so memory stays constant and the first bytes are sent
+as soon as the first batch is read.
+"""
+
+import io
+import csv
+import json
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+from sqlalchemy import select
+
+from database import create_session, Idea, EvaluationRecord
+
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# Exportable columns and their Parquet types
+EXPORT_COLUMNS = {
+    "id": "string",
+    "title": "string",
+    "description": "string",
+    "status": "string",
+    "votes": "int64",
+    "cluster_name": "string",
+    "duplicate_of": "string",
+    "created_at": "timestamp",
+    "updated_at": "timestamp",
+    "evaluation_summary": "string",
+    "desirability_score": "float64",
+    "desirability_reasoning": "string",
+    "feasibility_score": "float64",
+    "feasibility_reasoning": "string",
+    "viability_score": "float64",
+    "viability_reasoning": "string",
+    "evaluation_criteria_version": "int64",
+}
+
+# Export columns read from the idea's current evaluation record rather than the idea row
+EVALUATION_TEXT_COLUMNS = {
+    "evaluation_summary": EvaluationRecord.summary,
+    "desirability_reasoning": EvaluationRecord.desirability_reasoning,
+    "feasibility_reasoning": EvaluationRecord.feasibility_reasoning,
+    "viability_reasoning": EvaluationRecord.viability_reasoning,
+}
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def build_query(
+    columns: List[str],
+    status: Optional[str] = None,
+    cluster_name: Optional[str] = None,
+    min_votes: Optional[int] = None,
+    evaluated: Optional[bool] = None,
+):
+    query = select(*[
+        EVALUATION_TEXT_COLUMNS[column].label(column) if column in EVALUATION_TEXT_COLUMNS else getattr(Idea, column)
+        for column in columns
+    ])
+    if any(column in EVALUATION_TEXT_COLUMNS for column in columns):
+        query = query.select_from(Idea).outerjoin(EvaluationRecord, EvaluationRecord.id == Idea.current_evaluation_id)
+    if status is not None:
+        query = query.where(Idea.status == status)
+    if cluster_name is not None:
+        query = query.where(Idea.cluster_name == cluster_name)
+    if min_votes is not None:
+        query = query.where(Idea.votes >= min_votes)
+    if evaluated is not None:
+        query = query.where(
+            Idea.current_evaluation_id.isnot(None) if evaluated else Idea.current_evaluation_id.is_(None)
+        )
+    # Primary key order walks the index, so no sort delays the first batch
+    return query.order_by(Idea.id)
+
+def _iter_batches(query) -> Iterator[List[tuple]]:
+    db = create_session()
+    try:
+        result = db.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for batch in result.partitions():
+            yield batch
+    finally:
+        db.close()
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def stream_csv(query, columns: List[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in _iter_batches(query):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def stream_ndjson(query, columns: List[str]) -> Iterator[str]:
+    for batch in _iter_batches(query):
+        yield "".join(
+            json.dumps({column: _json_value(value) for column, value in zip(columns, row)}) + "\n"
+            for row in batch
+        )
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file object whose contents are handed out and cleared after each row group"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def stream_parquet(query, columns: List[str]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {
+        "string": pa.string(),
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "timestamp": pa.timestamp("us"),
+    }
+    schema = pa.schema([(column, types[EXPORT_COLUMNS[column]]) for column in columns])
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for batch in _iter_batches(query):
+            # Each batch becomes one row group
+            arrays = [pa.array([row[i] for row in batch], type=schema.field(i).type) for i in range(len(columns))]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+STREAMERS = {
+    "csv": stream_csv,
+    "ndjson": stream_ndjson,
+    "parquet": stream_parquet,
+}
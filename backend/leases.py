@@ -0,0 +1,79 @@
+"""
+Expiring leases marking an idea as being evaluated or classified.
+
+A lease is a token plus an expiry time on the idea row, taken with a
+conditional UPDATE so only one request in any worker holds it. If the holder
+crashes the lease simply runs out after AI_LEASE_SECONDS.
+"""
+
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from cache import idea_cache
+from database import Idea
+from metrics import AI_LEASE_CONFLICTS
+
+LEASE_SECONDS = float(os.getenv("AI_LEASE_SECONDS", "300"))
+
+# Lease columns per operation: (token, expiry)
+LEASE_COLUMNS = {
+    "evaluate": (Idea.evaluation_lease_token, Idea.evaluation_lease_expires_at),
+    "classify": (Idea.classification_lease_token, Idea.classification_lease_expires_at),
+}
+
+def lease_active(expires_at: Optional[datetime]) -> bool:
+    return expires_at is not None and expires_at > datetime.utcnow()
+
+def lease_free(operation: str):
+    """Filter matching ideas with no unexpired lease for `operation`"""
+    _, expires_column = LEASE_COLUMNS[operation]
+    return or_(expires_column.is_(None), expires_column <= datetime.utcnow())
+
+def acquire_leases(db: Session, idea_ids: List[str], operation: str) -> Tuple[Optional[str], List[str]]:
+    """Lease every idea in `idea_ids` that is free; returns the token and the ideas leased.
+
+    Commits, so other requests see the lease straight away.
+    """
+    if not idea_ids:
+        return None, []
+    token_column, expires_column = LEASE_COLUMNS[operation]
+    token = str(uuid.uuid4())
+    now = datetime.utcnow()
+    db.query(Idea).filter(Idea.id.in_(idea_ids), lease_free(operation)).update(
+        {
+            token_column: token,
+            expires_column: now + timedelta(seconds=LEASE_SECONDS),
+            # A lease is not an edit of the idea
+            Idea.updated_at: Idea.updated_at,
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+    leased = [row.id for row in db.query(Idea.id).filter(Idea.id.in_(idea_ids), token_column == token)]
+    # End the read's transaction too, so the caller holds no connection while it works
+    db.commit()
+    # Cached detail views show whether an idea is being evaluated or classified
+    idea_cache.invalidate(*leased)
+    if len(leased) < len(idea_ids):
+        AI_LEASE_CONFLICTS.labels(operation=operation).inc(len(idea_ids) - len(leased))
+    return token, leased
+
+def acquire_lease(db: Session, idea_id: str, operation: str) -> Optional[str]:
+    """Lease one idea; None if it is missing or already leased"""
+    token, leased = acquire_leases(db, [idea_id], operation)
+    return token if leased else None
+
+def release_leases(db: Session, idea_ids: List[str], operation: str, token: str):
+    """Clear leases still held under `token`; one that expired and was taken over is left alone"""
+    token_column, expires_column = LEASE_COLUMNS[operation]
+    db.query(Idea).filter(Idea.id.in_(idea_ids), token_column == token).update(
+        {token_column: None, expires_column: None, Idea.updated_at: Idea.updated_at},
+        synchronize_session=False,
+    )
+    db.commit()
+    idea_cache.invalidate(*idea_ids)
@@ -1,26 +1,65 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File
+import time
+
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, JSONResponse, StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from contextlib import asynccontextmanager
 from typing import List, Optional
+import os
 import json
 import csv
 import io
+import hashlib
 from datetime import datetime
 import uuid
+from collections import Counter
 
-from database import get_db, create_tables, Idea, EvaluationCriteria
+from database import (
+    get_db, init_db, ping_db, tables_ready, create_session, content_hash,
+    Idea, EvaluationCriteria, EvaluationRecord, ScoringWeights
+)
 from schemas import (
     IdeaCreate, IdeaUpdate, IdeaResponse, 
     EvaluationCriteriaCreate, EvaluationCriteriaResponse,
     ClusterConfig, IdeaCluster, SingleClusterSuggestion,
+    BatchClassificationRequest, BatchClassificationResponse, EvaluationRecordResponse,
+    ScoringWeightsUpdate, ScoringWeightsResponse,
     EvaluationRequest, IdeaStatus
 )
-from ai_service import AIService
+from ai_service import AIService, get_ai_service
+from export import EXPORT_COLUMNS, EXPORT_FORMATS, STREAMERS, build_query, parquet_available
+from scoring import composite_score, recompute_all_scores, get_weights, scored_count, score_percentile
+from cache import idea_cache, criteria_cache
+from leases import acquire_lease, acquire_leases, release_leases, lease_active
+from singleflight import SingleFlight
+from scheduler import ai_priority
+from dedup import (
+    DUPLICATE_POLICIES, DUPLICATE_THRESHOLD, BatchIndex, hasher, idea_text, default_policy,
+    find_duplicate, find_duplicates, stored_similarity, index_idea, unindex_idea
+)
+from metrics import (
+    REGISTRY, CONTENT_TYPE, COLD_START_SECONDS, DUPLICATES_DETECTED, EVALUATIONS_REUSED, MetricsMiddleware
+)
 
-app = FastAPI(title="Idea Factory API", version="1.0.0")
+cold_start_seconds = None
 
-# Create tables on startup
-create_tables()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs once in every worker after it has started, so the engine and its
+    # connections are created in the process that uses them
+    global cold_start_seconds
+    init_db()
+    cold_start_seconds = time.perf_counter() - _import_started
+    COLD_START_SECONDS.set(cold_start_seconds)
+    print(f"[OK] Worker {os.getpid()} ready in {cold_start_seconds * 1000:.0f} ms")
+    yield
+
+app = FastAPI(title="Idea Factory API", version="1.0.0", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -30,25 +69,95 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
-ai_service = AIService()
+def get_ai() -> AIService:
+    # The AI client is built on first use; a missing API key only affects AI routes
+    try:
+        return get_ai_service()
+    except ValueError as e:
+        raise HTTPException(status_code=503, detail=f"AI service unavailable: {str(e)}")
 
 @app.get("/")
 async def root():
     return {"message": "Idea Factory API"}
 
+@app.get("/healthz", include_in_schema=False)
+async def liveness():
+    return {"status": "ok"}
+
+@app.get("/readyz", include_in_schema=False)
+async def readiness():
+    ready = tables_ready() and ping_db()
+    body = {
+        "status": "ready" if ready else "not ready",
+        "database": "ok" if ready else "unavailable",
+        "cold_start_ms": round(cold_start_seconds * 1000, 1) if cold_start_seconds is not None else None,
+    }
+    return JSONResponse(content=body, status_code=200 if ready else 503)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
 # Ideas endpoints
-@app.post("/api/ideas", response_model=IdeaResponse)
-async def create_idea(idea: IdeaCreate, db: Session = Depends(get_db)):
+def resolve_duplicate_policy(duplicate_policy: Optional[str]) -> str:
+    if duplicate_policy is None:
+        return default_policy()
+    if duplicate_policy not in DUPLICATE_POLICIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"duplicate_policy must be one of: {', '.join(DUPLICATE_POLICIES)}"
+        )
+    return duplicate_policy
+
+def insert_idea(db: Session, title: str, description: str, policy: str):
+    """Insert an idea unless the duplicate policy says otherwise.
+
+    Returns (outcome, idea, similarity) where outcome is "created", "linked",
+    "merged" or "rejected"; for the last two `idea` is the canonical idea.
+    """
+    signature = hasher.signature(idea_text(title, description))
+    match = find_duplicate(db, signature) if policy != "allow" else None
+    
+    if match:
+        canonical, similarity = match
+        DUPLICATES_DETECTED.labels(policy=policy).inc()
+        if policy == "reject":
+            return "rejected", canonical, similarity
+        if policy == "merge":
+            # A resubmission counts as a vote for the original idea
+            canonical.votes += 1
+            canonical.updated_at = datetime.utcnow()
+            return "merged", canonical, similarity
+    
     db_idea = Idea(
         id=str(uuid.uuid4()),
-        title=idea.title,
-        description=idea.description,
+        title=title,
+        description=description,
+        content_hash=content_hash(title, description),
+        duplicate_of=match[0].id if match else None,
         status="DRAFT",
         votes=0
     )
     db.add(db_idea)
+    index_idea(db, db_idea.id, signature, replace=False)
+    return ("linked" if match else "created"), db_idea, match[1] if match else None
+
+@app.post("/api/ideas", response_model=IdeaResponse)
+async def create_idea(idea: IdeaCreate, duplicate_policy: Optional[str] = None, db: Session = Depends(get_db)):
+    policy = resolve_duplicate_policy(duplicate_policy)
+    outcome, db_idea, similarity = insert_idea(db, idea.title, idea.description, policy)
+    if outcome == "rejected":
+        raise HTTPException(status_code=409, detail={
+            "message": "A near-duplicate idea already exists",
+            "duplicate_of": db_idea.id,
+            "similarity": similarity
+        })
+    
     db.commit()
+    if outcome == "merged":
+        idea_cache.invalidate(db_idea.id)
     db.refresh(db_idea)
     return format_idea_response(db_idea)
 
@@ -57,12 +166,100 @@ async def get_ideas(db: Session = Depends(get_db)):
     ideas = db.query(Idea).all()
     return [format_idea_response(idea) for idea in ideas]
 
+@app.get("/api/ideas/export")
+async def export_ideas(
+    format: str = "csv",
+    columns: Optional[str] = None,
+    status: Optional[IdeaStatus] = None,
+    cluster_name: Optional[str] = None,
+    min_votes: Optional[int] = None,
+    evaluated: Optional[bool] = None
+):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=400, detail="Parquet export requires the pyarrow package")
+    
+    selected = [column.strip() for column in columns.split(",") if column.strip()] if columns else list(EXPORT_COLUMNS)
+    unknown = [column for column in selected if column not in EXPORT_COLUMNS]
+    if unknown or not selected:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown columns: {', '.join(unknown)}" if unknown else "No columns selected"
+        )
+    
+    query = build_query(selected, status.value if status else None, cluster_name, min_votes, evaluated)
+    media_type, extension = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        STREAMERS[format](query, selected),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="ideas.{extension}"'}
+    )
+
+@app.get("/api/ideas/top", response_model=List[IdeaResponse])
+async def get_top_ideas(by: str = "score", k: int = 10, db: Session = Depends(get_db)):
+    if by not in ("score", "votes"):
+        raise HTTPException(status_code=400, detail="by must be 'score' or 'votes'")
+    if not 1 <= k <= 100:
+        raise HTTPException(status_code=400, detail="k must be between 1 and 100")
+    
+    # Both orderings are served by an index, so only k rows are read
+    if by == "score":
+        query = db.query(Idea).filter(Idea.composite_score.isnot(None)).order_by(Idea.composite_score.desc())
+    else:
+        query = db.query(Idea).order_by(Idea.votes.desc())
+    total = scored_count(db)
+    return [
+        format_idea_response(idea, percentile=score_percentile(db, idea.composite_score, total))
+        for idea in query.limit(k)
+    ]
+
 @app.get("/api/ideas/{idea_id}", response_model=IdeaResponse)
 async def get_idea(idea_id: str, db: Session = Depends(get_db)):
+    entry = idea_cache.get(idea_id)
+    if entry is None:
+        version = idea_cache.version
+        idea = db.query(Idea).filter(Idea.id == idea_id).first()
+        if not idea:
+            raise HTTPException(status_code=404, detail="Idea not found")
+        entry = (
+            format_idea_response(idea, current_evaluation(db, idea)),
+            idea.evaluation_lease_expires_at,
+            idea.classification_lease_expires_at
+        )
+        idea_cache.set(idea_id, entry, version)
+    
+    # Lease flags and the percentile are derived on every read, so an expired lease never
+    # lingers in the cache and other ideas' evaluations never leave a stale rank behind
+    response, evaluating_until, classifying_until = entry
+    return response.model_copy(update={
+        "is_evaluating": lease_active(evaluating_until),
+        "is_classifying": lease_active(classifying_until),
+        "score_percentile": score_percentile(db, response.composite_score)
+    })
+
+@app.get("/api/ideas/{idea_id}/evaluations", response_model=List[EvaluationRecordResponse])
+async def get_evaluation_history(idea_id: str, db: Session = Depends(get_db)):
     idea = db.query(Idea).filter(Idea.id == idea_id).first()
     if not idea:
         raise HTTPException(status_code=404, detail="Idea not found")
-    return format_idea_response(idea)
+    
+    records = (
+        db.query(EvaluationRecord)
+        .filter(EvaluationRecord.idea_id == idea_id)
+        .order_by(EvaluationRecord.id.desc())
+    )
+    return [
+        EvaluationRecordResponse(
+            id=record.id,
+            criteria_version=record.criteria_version,
+            current=record.id == idea.current_evaluation_id,
+            fallback=bool(record.fallback),
+            created_at=record.created_at,
+            evaluation=record_dict(record)
+        )
+        for record in records
+    ]
 
 @app.put("/api/ideas/{idea_id}", response_model=IdeaResponse)
 async def update_idea(idea_id: str, idea_update: IdeaUpdate, db: Session = Depends(get_db)):
@@ -73,8 +270,18 @@ async def update_idea(idea_id: str, idea_update: IdeaUpdate, db: Session = Depen
     for field, value in idea_update.dict(exclude_unset=True).items():
         setattr(idea, field, value)
     
+    new_hash = content_hash(idea.title, idea.description)
+    if new_hash != idea.content_hash:
+        idea.content_hash = new_hash
+        signature = hasher.signature(idea_text(idea.title, idea.description))
+        index_idea(db, idea.id, signature)
+        # The edit may have made it a near-duplicate of another idea, or no longer one
+        match = find_duplicate(db, signature, exclude_id=idea.id)
+        idea.duplicate_of = match[0].id if match else None
+    
     idea.updated_at = datetime.utcnow()
     db.commit()
+    idea_cache.invalidate(idea_id)
     db.refresh(idea)
     return format_idea_response(idea)
 
@@ -84,8 +291,16 @@ async def delete_idea(idea_id: str, db: Session = Depends(get_db)):
     if not idea:
         raise HTTPException(status_code=404, detail="Idea not found")
     
+    unindex_idea(db, idea_id)
+    db.query(EvaluationRecord).filter(EvaluationRecord.idea_id == idea_id).delete(synchronize_session=False)
+    duplicate_ids = [row.id for row in db.query(Idea.id).filter(Idea.duplicate_of == idea_id)]
+    db.query(Idea).filter(Idea.duplicate_of == idea_id).update(
+        {"duplicate_of": None}, synchronize_session=False
+    )
     db.delete(idea)
     db.commit()
+    # Its duplicates were unlinked
+    idea_cache.invalidate(idea_id, *duplicate_ids)
     return {"message": "Idea deleted successfully"}
 
 @app.post("/api/ideas/{idea_id}/vote", response_model=IdeaResponse)
@@ -97,6 +312,7 @@ async def vote_idea(idea_id: str, db: Session = Depends(get_db)):
     idea.votes += 1
     idea.updated_at = datetime.utcnow()
     db.commit()
+    idea_cache.invalidate(idea_id)
     db.refresh(idea)
     return format_idea_response(idea)
 
@@ -109,12 +325,14 @@ async def publish_idea(idea_id: str, db: Session = Depends(get_db)):
     idea.status = "PUBLISHED"
     idea.updated_at = datetime.utcnow()
     db.commit()
+    idea_cache.invalidate(idea_id)
     db.refresh(idea)
     return format_idea_response(idea)
 
 # File upload endpoints
 @app.post("/api/ideas/upload")
-async def upload_ideas(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def upload_ideas(file: UploadFile = File(...), duplicate_policy: Optional[str] = None, db: Session = Depends(get_db)):
+    policy = resolve_duplicate_policy(duplicate_policy)
     if not file.filename.endswith(('.csv', '.json')):
         raise HTTPException(status_code=400, detail="Only CSV and JSON files are supported")
     
@@ -129,100 +347,394 @@ async def upload_ideas(file: UploadFile = File(...), db: Session = Depends(get_d
     else:
         ideas_data = json.loads(content_str)
     
-    created_ideas = []
-    for item in ideas_data:
-        if 'title' in item and 'description' in item and item['title'] and item['description']:
-            db_idea = Idea(
-                id=str(uuid.uuid4()),
-                title=item['title'],
-                description=item['description'],
-                status="DRAFT",
-                votes=0
-            )
-            db.add(db_idea)
-            created_ideas.append(db_idea)
+    outcomes = {"created": 0, "linked": 0, "merged": 0, "rejected": 0}
+    now = datetime.utcnow()
+    # Rows from earlier in the file are checked in memory and written together at the end
+    batch = BatchIndex()
+    new_ideas = {}
+    merged_votes = Counter()
+    items = [
+        (item['title'], item['description']) for item in ideas_data
+        if 'title' in item and 'description' in item and item['title'] and item['description']
+    ]
+    signatures = [hasher.signature(idea_text(title, description)) for title, description in items]
+    stored_matches = find_duplicates(db, signatures) if policy != "allow" else [None] * len(items)
+    for (title, description), signature, stored in zip(items, signatures, stored_matches):
+        match = None
+        if policy != "allow":
+            matches = [m for m in (stored, batch.find(signature)) if m]
+            match = max(matches, key=lambda m: m[1], default=None)
+        
+        if match:
+            DUPLICATES_DETECTED.labels(policy=policy).inc()
+            if policy == "reject":
+                outcomes["rejected"] += 1
+                continue
+            if policy == "merge":
+                # A resubmission counts as a vote for the original idea
+                outcomes["merged"] += 1
+                if match[0] in new_ideas:
+                    new_ideas[match[0]]["votes"] += 1
+                else:
+                    merged_votes[match[0]] += 1
+                continue
+        
+        idea_id = str(uuid.uuid4())
+        new_ideas[idea_id] = {
+            "id": idea_id,
+            "title": title,
+            "description": description,
+            "content_hash": content_hash(title, description),
+            "duplicate_of": match[0] if match else None,
+            "status": "DRAFT",
+            "votes": 0,
+            "created_at": now,
+            "updated_at": now
+        }
+        batch.add(idea_id, signature, match[0] if match else None)
+        outcomes["linked" if match else "created"] += 1
     
+    db.bulk_insert_mappings(Idea, list(new_ideas.values()))
+    batch.write(db)
+    for idea_id, votes in merged_votes.items():
+        db.query(Idea).filter(Idea.id == idea_id).update(
+            {Idea.votes: Idea.votes + votes, Idea.updated_at: now}, synchronize_session=False
+        )
     db.commit()
-    return {"message": f"Successfully uploaded {len(created_ideas)} ideas"}
+    if merged_votes:
+        idea_cache.invalidate(*merged_votes)
+    uploaded = outcomes["created"] + outcomes["linked"]
+    message = f"Successfully uploaded {uploaded} ideas"
+    skipped = outcomes["merged"] + outcomes["rejected"]
+    if skipped:
+        message += f" ({skipped} near-duplicates {'merged' if policy == 'merge' else 'skipped'})"
+    return {"message": message, **outcomes}
 
 # Evaluation criteria endpoints
+def get_current_criteria(db: Session) -> Optional[EvaluationCriteria]:
+    """Highest criteria version, read through the criteria cache.
+
+    The cached object is detached from any session; treat it as read-only.
+    """
+    criteria = criteria_cache.get("current")
+    if criteria is None:
+        version = criteria_cache.version
+        criteria = db.query(EvaluationCriteria).order_by(EvaluationCriteria.version.desc()).first()
+        if criteria:
+            db.expunge(criteria)
+            criteria_cache.set("current", criteria, version)
+    return criteria
+
 @app.get("/api/evaluation-criteria", response_model=Optional[EvaluationCriteriaResponse])
 async def get_evaluation_criteria(db: Session = Depends(get_db)):
-    criteria = db.query(EvaluationCriteria).first()
+    criteria = get_current_criteria(db)
     return criteria
 
+CRITERIA_SAVE_ATTEMPTS = 3
+
 @app.post("/api/evaluation-criteria", response_model=EvaluationCriteriaResponse)
-async def create_or_update_evaluation_criteria(criteria: EvaluationCriteriaCreate, db: Session = Depends(get_db)):
-    existing = db.query(EvaluationCriteria).first()
+async def create_or_update_evaluation_criteria(
+    criteria: EvaluationCriteriaCreate,
+    background_tasks: BackgroundTasks,
+    reevaluate: bool = False,
+    db: Session = Depends(get_db)
+):
+    # Read past the cache: the new version must follow the latest one in the database
+    existing = db.query(EvaluationCriteria).order_by(EvaluationCriteria.version.desc()).first()
+    
+    if existing and (existing.desirability, existing.feasibility, existing.viability) == (
+        criteria.desirability, criteria.feasibility, criteria.viability
+    ):
+        return existing
+    
+    # Keep previous versions so evaluations can be traced back to their criteria.
+    # The version is taken inside the INSERT; a concurrent save that got the same
+    # one fails the unique index and is retried.
+    for attempt in range(CRITERIA_SAVE_ATTEMPTS):
+        next_version = select(func.coalesce(func.max(EvaluationCriteria.version), 0) + 1).scalar_subquery()
+        db_criteria = EvaluationCriteria(**criteria.dict(), version=next_version)
+        db.add(db_criteria)
+        try:
+            db.commit()
+            break
+        except IntegrityError:
+            db.rollback()
+            if attempt == CRITERIA_SAVE_ATTEMPTS - 1:
+                raise HTTPException(status_code=409, detail="Evaluation criteria were saved concurrently, try again")
+    criteria_cache.clear()
+    db.refresh(db_criteria)
     
+    if reevaluate and existing:
+        schedule_stale_reevaluation(background_tasks)
+    return db_criteria
+
+# Scoring weights endpoints
+@app.get("/api/scoring-weights", response_model=ScoringWeightsResponse)
+async def get_scoring_weights(db: Session = Depends(get_db)):
+    return get_weights(db)
+
+@app.put("/api/scoring-weights", response_model=ScoringWeightsResponse)
+async def update_scoring_weights(weights: ScoringWeightsUpdate, db: Session = Depends(get_db)):
+    if weights.desirability + weights.feasibility + weights.viability <= 0:
+        raise HTTPException(status_code=400, detail="At least one weight must be positive")
+    
+    existing = db.query(ScoringWeights).first()
     if existing:
-        existing.desirability = criteria.desirability
-        existing.feasibility = criteria.feasibility
-        existing.viability = criteria.viability
+        existing.desirability = weights.desirability
+        existing.feasibility = weights.feasibility
+        existing.viability = weights.viability
         existing.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(existing)
-        return existing
     else:
-        db_criteria = EvaluationCriteria(**criteria.dict())
-        db.add(db_criteria)
-        db.commit()
-        db.refresh(db_criteria)
-        return db_criteria
+        db.add(ScoringWeights(**weights.dict()))
+    db.flush()
+    
+    # Every composite score depends on the weights
+    recompute_all_scores(db, weights.dict())
+    db.commit()
+    idea_cache.clear()
+    return get_weights(db)
 
 # AI endpoints
-@app.post("/api/ideas/evaluate")
-async def evaluate_ideas(request: EvaluationRequest, db: Session = Depends(get_db)):
-    # Get evaluation criteria
-    criteria = db.query(EvaluationCriteria).first()
-    if not criteria:
-        raise HTTPException(status_code=400, detail="Evaluation criteria not set")
-    
-    criteria_dict = {
+def criteria_to_dict(criteria: EvaluationCriteria) -> dict:
+    return {
         "desirability": criteria.desirability,
         "feasibility": criteria.feasibility,
         "viability": criteria.viability
     }
-    
-    # Set ideas as evaluating
-    db.query(Idea).filter(Idea.id.in_(request.idea_ids)).update(
-        {"is_evaluating": True}, synchronize_session=False
+
+def reusable_evaluation(db: Session, idea: Idea, criteria: EvaluationCriteria) -> Optional[dict]:
+    """The canonical idea's evaluation, if this idea is a near-duplicate of a freshly evaluated one"""
+    if not idea.duplicate_of:
+        return None
+    canonical = db.query(Idea).filter(Idea.id == idea.duplicate_of).first()
+    if (
+        not canonical
+        or not canonical.current_evaluation_id
+        or canonical.evaluation_criteria_version != criteria.version
+        or canonical.evaluation_content_hash != canonical.content_hash
+    ):
+        return None
+    # Either idea may have been edited since they were linked
+    similarity = stored_similarity(db, idea.id, canonical.id)
+    if similarity is None or similarity < DUPLICATE_THRESHOLD:
+        return None
+    record = current_evaluation(db, canonical)
+    if not record or record.fallback:
+        # Never copy the placeholder from a failed AI call
+        return None
+    EVALUATIONS_REUSED.inc()
+    return record_dict(record)
+
+def apply_evaluation(db: Session, idea: Idea, evaluation: dict, criteria_version: int, content_hash: str) -> bool:
+    """Record a new evaluation, stamped with the criteria and content it was based on, and make it the idea's current one.
+
+    A fallback placeholder from a failed AI call is kept in the history unstamped and
+    leaves the idea's current evaluation alone. Returns False in that case.
+    """
+    fallback = bool(evaluation.get("fallback"))
+    record = EvaluationRecord(
+        idea_id=idea.id,
+        criteria_version=None if fallback else criteria_version,
+        content_hash=None if fallback else content_hash,
+        fallback=fallback,
+        summary=evaluation["summary"],
+        desirability_score=evaluation["desirability"]["score"],
+        desirability_reasoning=evaluation["desirability"]["reasoning"],
+        feasibility_score=evaluation["feasibility"]["score"],
+        feasibility_reasoning=evaluation["feasibility"]["reasoning"],
+        viability_score=evaluation["viability"]["score"],
+        viability_reasoning=evaluation["viability"]["reasoning"]
     )
-    db.commit()
+    db.add(record)
+    db.flush()
+    if fallback:
+        return False
+    
+    idea.current_evaluation_id = record.id
+    idea.desirability_score = record.desirability_score
+    idea.feasibility_score = record.feasibility_score
+    idea.viability_score = record.viability_score
+    idea.evaluation_criteria_version = criteria_version
+    idea.evaluation_content_hash = content_hash
+    idea.composite_score = composite_score(idea, get_weights(db))
+    idea.updated_at = datetime.utcnow()
+    return True
+
+# Concurrent requests for the same idea and inputs share one in-flight call
+ai_flights = SingleFlight()
+
+def release_leases_in_new_session(idea_ids: List[str], operation: str, token: str):
+    db = create_session()
+    try:
+        release_leases(db, idea_ids, operation, token)
+    finally:
+        db.close()
+
+async def evaluate_idea_once(idea_id: str, criteria_version: int, ai_service: AIService) -> str:
+    """Evaluate one idea and store the result while holding its evaluation lease.
+
+    Runs in its own sessions because every request waiting on it shares the result.
+    No connection is held while waiting on the AI call.
+    Returns "evaluated", "failed" (the AI call did not produce an evaluation),
+    "busy" (leased by another request) or "missing".
+    """
+    db = create_session()
+    try:
+        token = acquire_lease(db, idea_id, "evaluate")
+        if token is None:
+            return "busy" if db.query(Idea.id).filter(Idea.id == idea_id).first() else "missing"
+        idea = db.query(Idea).filter(Idea.id == idea_id).first()
+        criteria = db.query(EvaluationCriteria).filter(EvaluationCriteria.version == criteria_version).first()
+        evaluation = reusable_evaluation(db, idea, criteria)
+        content_hash = idea.content_hash
+        idea_data = {"title": idea.title, "description": idea.description}
+        criteria_data = criteria_to_dict(criteria)
+    finally:
+        db.close()
     
     try:
-        for idea_id in request.idea_ids:
+        if evaluation is None:
+            evaluation = await ai_service.evaluate_idea(idea_data, criteria_data)
+        db = create_session()
+        try:
             idea = db.query(Idea).filter(Idea.id == idea_id).first()
-            if not idea:
-                continue
-            
-            idea_data = {"title": idea.title, "description": idea.description}
-            evaluation = await ai_service.evaluate_idea(idea_data, criteria_dict)
-            
-            # Update idea with evaluation results
-            idea.evaluation_summary = evaluation["summary"]
-            idea.desirability_score = evaluation["desirability"]["score"]
-            idea.desirability_reasoning = evaluation["desirability"]["reasoning"]
-            idea.feasibility_score = evaluation["feasibility"]["score"]
-            idea.feasibility_reasoning = evaluation["feasibility"]["reasoning"]
-            idea.viability_score = evaluation["viability"]["score"]
-            idea.viability_reasoning = evaluation["viability"]["reasoning"]
-            idea.is_evaluating = False
-            idea.updated_at = datetime.utcnow()
-        
-        db.commit()
-        return {"message": f"Successfully evaluated {len(request.idea_ids)} ideas"}
+            if idea is None:
+                return "missing"
+            applied = apply_evaluation(db, idea, evaluation, criteria_version, content_hash)
+            db.commit()
+        finally:
+            db.close()
+        idea_cache.invalidate(idea_id)
+        return "evaluated" if applied else "failed"
+    finally:
+        release_leases_in_new_session([idea_id], "evaluate", token)
+
+async def evaluate_idea_shared(idea_id: str, idea_hash: str, criteria_version: int, ai_service: AIService) -> str:
+    key = ("evaluate", idea_id, f"{idea_hash}:{criteria_version}")
+    return await ai_flights.do(key, lambda: evaluate_idea_once(idea_id, criteria_version, ai_service))
+
+@app.post("/api/ideas/evaluate")
+async def evaluate_ideas(request: EvaluationRequest, db: Session = Depends(get_db), ai_service: AIService = Depends(get_ai)):
+    # Get evaluation criteria
+    criteria = get_current_criteria(db)
+    if not criteria:
+        raise HTTPException(status_code=400, detail="Evaluation criteria not set")
     
+    ideas = db.query(Idea.id, Idea.content_hash, Idea.duplicate_of).filter(Idea.id.in_(request.idea_ids)).all()
+    # Canonical ideas first, so their near-duplicates can reuse the result
+    ideas.sort(key=lambda idea: idea.duplicate_of is not None)
+    criteria_version = criteria.version
+    # Return the connection to the pool while waiting on the AI calls
+    db.commit()
+    
+    outcomes = {}
+    try:
+        # A user waiting on one idea goes ahead of multi-idea evaluations
+        with ai_priority("interactive" if len(ideas) == 1 else "bulk"):
+            for idea in ideas:
+                outcomes[idea.id] = await evaluate_idea_shared(idea.id, idea.content_hash, criteria_version, ai_service)
     except Exception as e:
-        # Reset evaluating status on error
-        db.query(Idea).filter(Idea.id.in_(request.idea_ids)).update(
-            {"is_evaluating": False}, synchronize_session=False
-        )
-        db.commit()
         raise HTTPException(status_code=500, detail=f"Evaluation failed: {str(e)}")
+    
+    evaluated_ids = [idea_id for idea_id, outcome in outcomes.items() if outcome == "evaluated"]
+    in_progress = [idea_id for idea_id, outcome in outcomes.items() if outcome == "busy"]
+    failed = [idea_id for idea_id, outcome in outcomes.items() if outcome == "failed"]
+    message = f"Successfully evaluated {len(evaluated_ids)} ideas"
+    if in_progress:
+        message += f"; {len(in_progress)} already being evaluated by another request"
+    if failed:
+        message += f"; {len(failed)} could not be evaluated"
+    return {"message": message, "in_progress": in_progress, "failed": failed}
+
+def stale_evaluations_query(db: Session, criteria: EvaluationCriteria):
+    """Evaluated ideas whose criteria version or content changed since, most important first"""
+    return (
+        db.query(Idea)
+        .filter(Idea.current_evaluation_id.isnot(None))
+        .filter(
+            (Idea.evaluation_criteria_version.is_(None))
+            | (Idea.evaluation_criteria_version != criteria.version)
+            | (Idea.evaluation_content_hash.is_(None))
+            | (Idea.evaluation_content_hash != Idea.content_hash)
+        )
+        .order_by((Idea.status == "PUBLISHED").desc(), Idea.votes.desc(), Idea.updated_at.asc())
+    )
+
+# Stale ideas fetched per query by the re-evaluation pass
+REEVALUATION_BATCH_SIZE = 100
+
+_reevaluation_running = False
+
+async def reevaluate_stale_ideas(limit: Optional[int] = None):
+    """Background pass re-evaluating stale ideas one at a time, committing each result"""
+    global _reevaluation_running
+    # Set here rather than when scheduling, so a task that never runs cannot leave it set
+    if _reevaluation_running:
+        return
+    _reevaluation_running = True
+    db = create_session()
+    evaluated = 0
+    # Ideas that stayed stale (failed, or leased by a request) are the first ones in
+    # priority order, since everything ahead of them was evaluated; skip past them
+    skipped = 0
+    try:
+        ai_service = get_ai_service()
+        while limit is None or evaluated < limit:
+            criteria = get_current_criteria(db)
+            if not criteria:
+                break
+            batch = (
+                stale_evaluations_query(db, criteria)
+                .with_entities(Idea.id, Idea.content_hash)
+                .offset(skipped)
+                .limit(REEVALUATION_BATCH_SIZE)
+                .all()
+            )
+            db.commit()
+            if not batch:
+                break
+            
+            for idea_id, idea_hash in batch:
+                if limit is not None and evaluated >= limit:
+                    break
+                # Re-read the criteria (from the cache) so an edit mid-pass is picked up
+                criteria = get_current_criteria(db)
+                if not criteria:
+                    break
+                with ai_priority("background"):
+                    outcome = await evaluate_idea_shared(idea_id, idea_hash, criteria.version, ai_service)
+                if outcome == "evaluated":
+                    evaluated += 1
+                elif outcome != "missing":
+                    skipped += 1
+        print(f"[OK] Re-evaluated {evaluated} stale ideas")
+    except Exception as e:
+        print(f"Error in reevaluate_stale_ideas: {e}")
+    finally:
+        _reevaluation_running = False
+        db.close()
+
+def schedule_stale_reevaluation(background_tasks: BackgroundTasks, limit: Optional[int] = None) -> bool:
+    if _reevaluation_running:
+        return False
+    background_tasks.add_task(reevaluate_stale_ideas, limit)
+    return True
+
+@app.post("/api/ideas/reevaluate-stale")
+async def reevaluate_stale(background_tasks: BackgroundTasks, limit: Optional[int] = None, db: Session = Depends(get_db)):
+    criteria = get_current_criteria(db)
+    if not criteria:
+        raise HTTPException(status_code=400, detail="Evaluation criteria not set")
+    
+    stale = stale_evaluations_query(db, criteria).count()
+    if not stale:
+        return {"message": "All evaluations are up to date", "stale": 0}
+    if not schedule_stale_reevaluation(background_tasks, limit):
+        return {"message": "Re-evaluation already in progress", "stale": stale}
+    return {"message": f"Re-evaluating {min(stale, limit) if limit is not None else stale} stale ideas in the background", "stale": stale}
 
 @app.post("/api/ideas/cluster")
-async def cluster_ideas(config: ClusterConfig, db: Session = Depends(get_db)):
+async def cluster_ideas(config: ClusterConfig, db: Session = Depends(get_db), ai_service: AIService = Depends(get_ai)):
     ideas = db.query(Idea).all()
     if not ideas:
         raise HTTPException(status_code=400, detail="No ideas found to cluster")
@@ -230,7 +742,8 @@ async def cluster_ideas(config: ClusterConfig, db: Session = Depends(get_db)):
     ideas_data = [{"id": idea.id, "title": idea.title, "description": idea.description} for idea in ideas]
     
     try:
-        clusters = await ai_service.cluster_ideas(ideas_data, config.dict())
+        with ai_priority("bulk"):
+            clusters = await ai_service.cluster_ideas(ideas_data, config.dict())
         return clusters
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Clustering failed: {str(e)}")
@@ -252,42 +765,110 @@ async def save_clusters(clusters: List[IdeaCluster], db: Session = Depends(get_d
                 idea.updated_at = datetime.utcnow()
         
         db.commit()
+        idea_cache.invalidate(*idea_cluster_map)
         return {"message": f"Successfully saved clusters for {len(idea_cluster_map)} ideas"}
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save clusters: {str(e)}")
 
+def get_existing_clusters(db: Session) -> dict:
+    """Map each cluster name to up to two example titles, the only part the prompts use"""
+    existing_clusters = {}
+    rows = db.query(Idea.cluster_name, Idea.title).filter(Idea.cluster_name.isnot(None)).yield_per(1000)
+    for cluster_name, title in rows:
+        titles = existing_clusters.setdefault(cluster_name, [])
+        if len(titles) < 2:
+            titles.append(title)
+    return existing_clusters
+
+@app.post("/api/ideas/classify-unclustered", response_model=BatchClassificationResponse)
+async def classify_unclustered_ideas(
+    request: BatchClassificationRequest,
+    db: Session = Depends(get_db),
+    ai_service: AIService = Depends(get_ai)
+):
+    query = db.query(Idea.id, Idea.title, Idea.description).filter(Idea.cluster_name.is_(None)).order_by(Idea.created_at)
+    if request.limit:
+        query = query.limit(request.limit)
+    ideas_data = [{"id": row.id, "title": row.title, "description": row.description} for row in query]
+    if not ideas_data:
+        return {"suggestions": [], "applied": 0}
+    
+    existing_clusters = get_existing_clusters(db)
+    
+    # Skip ideas another request is already classifying
+    token, idea_ids = acquire_leases(db, [idea["id"] for idea in ideas_data], "classify")
+    leased = set(idea_ids)
+    ideas_data = [idea for idea in ideas_data if idea["id"] in leased]
+    if not ideas_data:
+        return {"suggestions": [], "applied": 0}
+    
+    try:
+        with ai_priority("bulk"):
+            suggestions = await ai_service.classify_ideas(
+                ideas_data, existing_clusters, request.batch_size, request.max_concurrency
+            )
+        
+        applied = 0
+        if request.apply:
+            # All suggestions are written in one transaction; fallbacks stand in for
+            # a failed or invalid response and leave the idea unclustered
+            valid = [suggestion for suggestion in suggestions if not suggestion.get("fallback")]
+            now = datetime.utcnow()
+            db.bulk_update_mappings(Idea, [
+                {"id": suggestion["ideaId"], "cluster_name": suggestion["clusterName"], "updated_at": now}
+                for suggestion in valid
+            ])
+            applied = len(valid)
+            db.commit()
+            idea_cache.invalidate(*[suggestion["ideaId"] for suggestion in valid])
+        return {"suggestions": suggestions, "applied": applied}
+    
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Classification failed: {str(e)}")
+    finally:
+        release_leases(db, idea_ids, "classify", token)
+
+async def classify_idea_once(idea_id: str, idea_data: dict, existing_clusters: dict, ai_service: AIService) -> Optional[dict]:
+    """Classify one idea while holding its classification lease; None if another request holds it"""
+    db = create_session()
+    try:
+        token = acquire_lease(db, idea_id, "classify")
+    finally:
+        db.close()
+    if token is None:
+        return None
+    try:
+        return await ai_service.classify_single_idea(idea_data, existing_clusters)
+    finally:
+        release_leases_in_new_session([idea_id], "classify", token)
+
 @app.post("/api/ideas/{idea_id}/classify")
-async def classify_single_idea(idea_id: str, db: Session = Depends(get_db)):
+async def classify_single_idea(idea_id: str, db: Session = Depends(get_db), ai_service: AIService = Depends(get_ai)):
     idea = db.query(Idea).filter(Idea.id == idea_id).first()
     if not idea:
         raise HTTPException(status_code=404, detail="Idea not found")
     
-    # Set idea as classifying
-    idea.is_classifying = True
-    db.commit()
-    
     try:
         # Get existing clusters
-        clustered_ideas = db.query(Idea).filter(Idea.cluster_name.isnot(None)).all()
-        existing_clusters = {}
-        for clustered_idea in clustered_ideas:
-            if clustered_idea.cluster_name not in existing_clusters:
-                existing_clusters[clustered_idea.cluster_name] = []
-            existing_clusters[clustered_idea.cluster_name].append(clustered_idea.title)
+        existing_clusters = get_existing_clusters(db)
         
         idea_data = {"title": idea.title, "description": idea.description}
-        suggestion = await ai_service.classify_single_idea(idea_data, existing_clusters)
-        
-        idea.is_classifying = False
+        clusters_hash = hashlib.sha256(json.dumps(existing_clusters, sort_keys=True).encode("utf-8")).hexdigest()
+        key = ("classify", idea_id, f"{idea.content_hash}:{clusters_hash}")
+        # Return the connection to the pool while waiting on the AI call
         db.commit()
-        
-        return suggestion
-    
+        with ai_priority("interactive"):
+            suggestion = await ai_flights.do(
+                key, lambda: classify_idea_once(idea_id, idea_data, existing_clusters, ai_service)
+            )
     except Exception as e:
-        idea.is_classifying = False
-        db.commit()
         raise HTTPException(status_code=500, detail=f"Classification failed: {str(e)}")
+    
+    if suggestion is None:
+        raise HTTPException(status_code=409, detail="Idea is already being classified")
+    return suggestion
 
 @app.post("/api/ideas/{idea_id}/apply-classification")
 async def apply_classification(idea_id: str, suggestion: SingleClusterSuggestion, db: Session = Depends(get_db)):
@@ -298,6 +879,7 @@ async def apply_classification(idea_id: str, suggestion: SingleClusterSuggestion
     idea.cluster_name = suggestion.clusterName
     idea.updated_at = datetime.utcnow()
     db.commit()
+    idea_cache.invalidate(idea_id)
     
     return format_idea_response(idea)
 
@@ -305,26 +887,47 @@ async def apply_classification(idea_id: str, suggestion: SingleClusterSuggestion
 async def clear_all_clusters(db: Session = Depends(get_db)):
     db.query(Idea).update({"cluster_name": None}, synchronize_session=False)
     db.commit()
+    idea_cache.clear()
     return {"message": "All clusters cleared successfully"}
 
-def format_idea_response(idea: Idea) -> IdeaResponse:
+def current_evaluation(db: Session, idea: Idea) -> Optional[EvaluationRecord]:
+    """Load the idea's current evaluation text; only detail views need it"""
+    if not idea.current_evaluation_id:
+        return None
+    return db.query(EvaluationRecord).filter(EvaluationRecord.id == idea.current_evaluation_id).first()
+
+def record_dict(record: EvaluationRecord) -> dict:
+    return {
+        "summary": record.summary,
+        "desirability": {
+            "score": record.desirability_score,
+            "reasoning": record.desirability_reasoning
+        },
+        "feasibility": {
+            "score": record.feasibility_score,
+            "reasoning": record.feasibility_reasoning
+        },
+        "viability": {
+            "score": record.viability_score,
+            "reasoning": record.viability_reasoning
+        }
+    }
+
+def evaluation_dict(idea: Idea) -> Optional[dict]:
+    """Scores of the current evaluation, read from the idea row alone"""
     evaluation = None
-    if idea.evaluation_summary:
+    if idea.current_evaluation_id:
         evaluation = {
-            "summary": idea.evaluation_summary,
-            "desirability": {
-                "score": idea.desirability_score,
-                "reasoning": idea.desirability_reasoning
-            },
-            "feasibility": {
-                "score": idea.feasibility_score,
-                "reasoning": idea.feasibility_reasoning
-            },
-            "viability": {
-                "score": idea.viability_score,
-                "reasoning": idea.viability_reasoning
-            }
+            "summary": None,
+            "desirability": {"score": idea.desirability_score, "reasoning": None},
+            "feasibility": {"score": idea.feasibility_score, "reasoning": None},
+            "viability": {"score": idea.viability_score, "reasoning": None}
         }
+    return evaluation
+
+def format_idea_response(idea: Idea, record: Optional[EvaluationRecord] = None, percentile: Optional[float] = None) -> IdeaResponse:
+    """List-style response with scores only; pass the current record to include summary and reasoning"""
+    evaluation = record_dict(record) if record else evaluation_dict(idea)
     
     return IdeaResponse(
         id=idea.id,
@@ -333,8 +936,12 @@ def format_idea_response(idea: Idea) -> IdeaResponse:
         status=idea.status,
         votes=idea.votes,
         cluster_name=idea.cluster_name,
-        is_evaluating=idea.is_evaluating,
-        is_classifying=idea.is_classifying,
+        duplicate_of=idea.duplicate_of,
+        evaluation_criteria_version=idea.evaluation_criteria_version,
+        composite_score=idea.composite_score,
+        score_percentile=percentile,
+        is_evaluating=lease_active(idea.evaluation_lease_expires_at),
+        is_classifying=lease_active(idea.classification_lease_expires_at),
         created_at=idea.created_at,
         updated_at=idea.updated_at,
         evaluation=evaluation
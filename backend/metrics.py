@@ -0,0 +1,285 @@
+"""
+Lightweight in-process metrics rendered in the Prometheus text exposition format.
+
+Metrics are kept per process; when serving with several workers each worker
+exposes its own values on /metrics.
+"""
+
+import time
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import Match
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STATEMENT_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000)
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels: str):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        return self.labels()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def _render_child(self, key, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"]
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default().inc(amount)
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default().dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default().set(value)
+
+class _HistogramValue:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default().observe(value)
+
+    def _render_child(self, key, child) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# HTTP metrics
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests handled", ("method", "route", "status")))
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled", ("method", "route")))
+DB_STATEMENTS_PER_REQUEST = REGISTRY.register(Histogram(
+    "db_statements_per_request", "SQL statements executed while handling a request", ("method", "route"),
+    buckets=STATEMENT_COUNT_BUCKETS))
+
+COLD_START_SECONDS = REGISTRY.register(Gauge(
+    "app_cold_start_seconds", "Time from importing the app to the worker being ready"))
+
+DUPLICATES_DETECTED = REGISTRY.register(Counter(
+    "duplicates_detected_total", "Near-duplicate ideas detected on insert", ("policy",)))
+EVALUATIONS_REUSED = REGISTRY.register(Counter(
+    "evaluations_reused_total", "Evaluations copied from a canonical idea instead of calling the LLM"))
+
+# LLM metrics, labelled by AIService method
+AI_CALLS = REGISTRY.register(Counter(
+    "ai_calls_total", "LLM provider calls", ("method", "provider", "outcome")))
+AI_CALL_DURATION = REGISTRY.register(Histogram(
+    "ai_call_duration_seconds", "LLM provider call latency including retries", ("method", "provider")))
+AI_TOKENS = REGISTRY.register(Counter(
+    "ai_tokens_total", "LLM tokens sent and received", ("method", "direction")))
+AI_RETRIES = REGISTRY.register(Counter(
+    "ai_retries_total", "LLM calls retried after rate limiting", ("method",)))
+AI_FALLBACKS = REGISTRY.register(Counter(
+    "ai_fallbacks_total", "AIService responses replaced by the built-in fallback", ("method",)))
+AI_CACHE = REGISTRY.register(Counter(
+    "ai_cache_requests_total", "AIService response cache lookups", ("method", "result")))
+AI_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "ai_queue_depth", "LLM calls waiting for a concurrency slot", ("priority",)))
+AI_QUEUE_WAIT = REGISTRY.register(Histogram(
+    "ai_queue_wait_seconds", "Time LLM calls waited for a concurrency slot", ("priority",)))
+AI_SLOTS_IN_USE = REGISTRY.register(Gauge(
+    "ai_slots_in_use", "Concurrency slots held by running LLM calls", ("priority",)))
+AI_SINGLEFLIGHT = REGISTRY.register(Counter(
+    "ai_singleflight_total", "Per-idea AI requests that started work (leader) or joined one in flight (follower)",
+    ("operation", "role")))
+AI_LEASE_CONFLICTS = REGISTRY.register(Counter(
+    "ai_lease_conflicts_total", "Ideas skipped because another request holds their lease", ("operation",)))
+
+# Read-through caches
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "cache_requests_total", "Read-through cache lookups", ("cache", "result")))
+CACHE_INVALIDATIONS = REGISTRY.register(Counter(
+    "cache_invalidations_total", "Cache invalidations made by this worker or received from others",
+    ("cache", "source")))
+
+# SQL statement counting. The middleware installs a fresh one-element list per
+# request; the engine listener increments it, including from threadpool code,
+# because the context is copied but the list is shared.
+_statement_count: ContextVar[Optional[List[int]]] = ContextVar("statement_count", default=None)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    counter = _statement_count.get()
+    if counter is not None:
+        counter[0] += 1
+
+def _route_path(scope) -> str:
+    """Path template of the route handling the request, to keep label cardinality bounded"""
+    app = scope.get("app")
+    for route in getattr(getattr(app, "router", None), "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "<unmatched>"
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, in-flight requests and SQL statements per route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = _route_path(scope)
+        status = {"code": 500}
+        counter = [0]
+        in_flight = HTTP_IN_FLIGHT.labels(method=method, route=route)
+        finished = False
+
+        def finish():
+            # Background tasks run after the response, inside self.app; they are not the request's cost
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            elapsed = time.perf_counter() - started
+            in_flight.dec()
+            HTTP_REQUESTS.labels(method=method, route=route, status=status["code"]).inc()
+            HTTP_REQUEST_DURATION.labels(method=method, route=route).observe(elapsed)
+            DB_STATEMENTS_PER_REQUEST.labels(method=method, route=route).observe(counter[0])
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        token = _statement_count.set(counter)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _statement_count.reset(token)
+            finish()
@@ -0,0 +1,181 @@
+"""
+Priority scheduling of LLM calls across a global concurrency budget.
+
+Every provider call takes a slot from AI_MAX_CONCURRENCY. When calls are
+queued, free slots go to the priority classes by stride scheduling: each class
+advances a pass value by 1/weight per slot granted, and the waiting class with
+the lowest pass goes next. Interactive calls get most of the slots while they
+wait, but bulk and background work is never starved. Bulk and background calls
+together hold at most AI_MAX_CONCURRENCY - AI_INTERACTIVE_RESERVED slots, so an
+interactive call does not queue behind bulk jobs that fill the budget.
+
+The priority of a call comes from the ai_priority context variable, set by
+the route that starts the work. Work shared by several requests (see
+singleflight.py) runs under a SharedPriority instead, which is raised to the
+most important class among the requests waiting on it; a call already queued
+under it moves to the raised class.
+"""
+
+import os
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Callable, List, Optional
+
+from metrics import AI_QUEUE_DEPTH, AI_QUEUE_WAIT, AI_SLOTS_IN_USE
+
+PRIORITIES = ("interactive", "bulk", "background")
+
+# Share of the budget each class gets while all of them are waiting
+PRIORITY_WEIGHTS = {"interactive": 8, "bulk": 3, "background": 1}
+
+_priority: ContextVar[str] = ContextVar("ai_priority", default="interactive")
+
+class SharedPriority:
+    """Priority of work several callers wait on: the most important class any of them asked for"""
+
+    def __init__(self, priority: str):
+        self.priority = priority
+        self._listeners: List[Callable[[str, str], None]] = []
+
+    def raise_to(self, priority: str):
+        if PRIORITIES.index(priority) >= PRIORITIES.index(self.priority):
+            return
+        previous, self.priority = self.priority, priority
+        for listener in list(self._listeners):
+            listener(previous, priority)
+
+_shared: ContextVar[Optional[SharedPriority]] = ContextVar("ai_shared_priority", default=None)
+
+@contextmanager
+def ai_priority(priority: str):
+    """Run the enclosed LLM calls (and tasks started inside) at `priority`"""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown AI priority: {priority}")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+@contextmanager
+def shared_priority(shared: SharedPriority):
+    """Run the enclosed LLM calls (and tasks started inside) at `shared`'s priority as it changes"""
+    token = _shared.set(shared)
+    try:
+        yield
+    finally:
+        _shared.reset(token)
+
+def current_priority() -> str:
+    shared = _shared.get()
+    return shared.priority if shared else _priority.get()
+
+class PriorityScheduler:
+    """Weighted fair sharing of `max_concurrency` slots between priority classes"""
+
+    def __init__(self, max_concurrency: int = 8, interactive_reserved: int = 1):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        reserved = min(max(interactive_reserved, 0), max_concurrency - 1)
+        # Slots bulk and background calls may hold between them
+        self.shared_limit = max_concurrency - reserved
+        self._stride = {priority: 1.0 / PRIORITY_WEIGHTS[priority] for priority in PRIORITIES}
+        self._pass = {priority: 0.0 for priority in PRIORITIES}
+        self._virtual_time = 0.0
+        self._waiting = {priority: deque() for priority in PRIORITIES}
+        self._running = {priority: 0 for priority in PRIORITIES}
+        self._active = 0
+
+    @classmethod
+    def from_env(cls) -> "PriorityScheduler":
+        return cls(
+            max_concurrency=int(os.getenv("AI_MAX_CONCURRENCY", "8")),
+            interactive_reserved=int(os.getenv("AI_INTERACTIVE_RESERVED", "1")),
+        )
+
+    def queue_depth(self, priority: str) -> int:
+        return len(self._waiting[priority])
+
+    @asynccontextmanager
+    async def slot(self, priority: str = None):
+        """Hold a slot at `priority`, or at the context's priority (following a SharedPriority) if not given"""
+        shared = _shared.get() if priority is None else None
+        priority = await self.acquire(priority or current_priority(), shared)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    async def acquire(self, priority: str, shared: Optional[SharedPriority] = None) -> str:
+        """Wait for a slot; returns the class it was granted under, to pass to release()"""
+        waiter = asyncio.get_running_loop().create_future()
+        enqueued = time.perf_counter()
+        queued = [priority]
+        self._enqueue(priority, waiter)
+
+        def promote(previous: str, raised: str):
+            if waiter.done() or waiter not in self._waiting[queued[0]]:
+                return
+            self._waiting[queued[0]].remove(waiter)
+            AI_QUEUE_DEPTH.labels(priority=queued[0]).dec()
+            queued[0] = raised
+            self._enqueue(raised, waiter)
+
+        if shared is not None:
+            shared._listeners.append(promote)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just before the cancellation arrived
+                self.release(queued[0])
+            elif waiter in self._waiting[queued[0]]:
+                self._waiting[queued[0]].remove(waiter)
+                AI_QUEUE_DEPTH.labels(priority=queued[0]).dec()
+            raise
+        finally:
+            if shared is not None:
+                shared._listeners.remove(promote)
+        AI_QUEUE_WAIT.labels(priority=queued[0]).observe(time.perf_counter() - enqueued)
+        return queued[0]
+
+    def _enqueue(self, priority: str, waiter: asyncio.Future):
+        if not self._waiting[priority] and not self._running[priority]:
+            # A class returning from idle starts at the current virtual time
+            # rather than cashing in the turns it skipped
+            self._pass[priority] = max(self._pass[priority], self._virtual_time)
+        self._waiting[priority].append(waiter)
+        AI_QUEUE_DEPTH.labels(priority=priority).inc()
+        self._dispatch()
+
+    def release(self, priority: str):
+        self._running[priority] -= 1
+        self._active -= 1
+        AI_SLOTS_IN_USE.labels(priority=priority).dec()
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._active < self.max_concurrency:
+            shared_free = self._active - self._running["interactive"] < self.shared_limit
+            ready = [
+                priority for priority in PRIORITIES
+                if self._waiting[priority] and (priority == "interactive" or shared_free)
+            ]
+            if not ready:
+                return
+            # Ties go to the more important class
+            priority = min(ready, key=lambda p: (self._pass[p], PRIORITIES.index(p)))
+            waiter = self._waiting[priority].popleft()
+            AI_QUEUE_DEPTH.labels(priority=priority).dec()
+            if waiter.cancelled():
+                continue
+            self._virtual_time = self._pass[priority]
+            self._pass[priority] += self._stride[priority]
+            self._running[priority] += 1
+            self._active += 1
+            AI_SLOTS_IN_USE.labels(priority=priority).inc()
+            waiter.set_result(None)
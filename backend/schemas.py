@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
@@ -32,6 +32,10 @@ class IdeaResponse(IdeaBase):
     status: IdeaStatus
     votes: int
     cluster_name: Optional[str] = None
+    duplicate_of: Optional[str] = None
+    evaluation_criteria_version: Optional[int] = None
+    composite_score: Optional[float] = None
+    score_percentile: Optional[float] = None  # only on detail and top responses
     is_evaluating: bool
     is_classifying: bool
     created_at: datetime
@@ -41,6 +45,14 @@ class IdeaResponse(IdeaBase):
     class Config:
         from_attributes = True
 
+class EvaluationRecordResponse(BaseModel):
+    id: int
+    criteria_version: Optional[int] = None
+    current: bool
+    fallback: bool = False
+    created_at: datetime
+    evaluation: dict
+
 class EvaluationCriteriaBase(BaseModel):
     desirability: str
     feasibility: str
@@ -51,12 +63,23 @@ class EvaluationCriteriaCreate(EvaluationCriteriaBase):
 
 class EvaluationCriteriaResponse(EvaluationCriteriaBase):
     id: int
+    version: int
     created_at: datetime
     updated_at: datetime
     
     class Config:
         from_attributes = True
 
+class ScoringWeightsUpdate(BaseModel):
+    desirability: float = Field(ge=0)
+    feasibility: float = Field(ge=0)
+    viability: float = Field(ge=0)
+
+class ScoringWeightsResponse(BaseModel):
+    desirability: float
+    feasibility: float
+    viability: float
+
 class ClusterConfig(BaseModel):
     numberOfClusters: int
     clusteringBasis: str
@@ -71,5 +94,20 @@ class SingleClusterSuggestion(BaseModel):
     suggestionType: str
     clusterName: str
 
+class BatchClusterSuggestion(SingleClusterSuggestion):
+    ideaId: str
+    clusterName: str = Field(..., min_length=1)
+    fallback: bool = False  # placeholder for an idea the AI response missed or got wrong
+
+class BatchClassificationRequest(BaseModel):
+    batch_size: Optional[int] = Field(None, ge=1)
+    max_concurrency: Optional[int] = Field(None, ge=1)
+    limit: Optional[int] = Field(None, ge=1)
+    apply: bool = False
+
+class BatchClassificationResponse(BaseModel):
+    suggestions: List[BatchClusterSuggestion]
+    applied: int
+
 class EvaluationRequest(BaseModel):
     idea_ids: List[str]
\ No newline at end of file
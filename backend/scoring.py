@@ -0,0 +1,82 @@
+"""
+Composite scores and percentile ranks for evaluated ideas.
+
+The composite score is the weighted average of the desirability, feasibility
+and viability scores. A percentile is the mid-rank of an idea's composite
+score among all scored ideas: the share with a lower score plus half the
+share with an equal one, times 100. Percentiles are not stored, since one
+write would move every other idea's rank; they are counted at read time from
+the composite_score index.
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+from sqlalchemy import select, update, bindparam, func
+from sqlalchemy.orm import Session
+
+from database import Idea, ScoringWeights
+
+CRITERIA = ("desirability", "feasibility", "viability")
+
+RECOMPUTE_BATCH_SIZE = 10000
+
+def get_weights(db: Session) -> Dict[str, float]:
+    weights = db.query(ScoringWeights).first()
+    if not weights:
+        return {criterion: 1.0 for criterion in CRITERIA}
+    return {criterion: getattr(weights, criterion) for criterion in CRITERIA}
+
+def composite_score(idea: Idea, weights: Dict[str, float]) -> Optional[float]:
+    scores = [getattr(idea, f"{criterion}_score") for criterion in CRITERIA]
+    if any(score is None for score in scores):
+        return None
+    total = sum(weights.values())
+    return sum(weights[criterion] * score for criterion, score in zip(CRITERIA, scores)) / total
+
+def scored_count(db: Session) -> int:
+    return db.query(func.count()).select_from(Idea).filter(Idea.composite_score.isnot(None)).scalar()
+
+def score_percentile(db: Session, score: Optional[float], total: Optional[int] = None) -> Optional[float]:
+    """Percentile of a composite score among all scored ideas; pass `total` when ranking several"""
+    if score is None:
+        return None
+    if total is None:
+        total = scored_count(db)
+    if not total:
+        return None
+    # Counting from the top keeps the index range short for the ideas shown most
+    higher = db.query(func.count()).select_from(Idea).filter(Idea.composite_score > score).scalar()
+    equal = db.query(func.count()).select_from(Idea).filter(Idea.composite_score == score).scalar()
+    return 100.0 * (total - higher - 0.5 * equal) / total
+
+def recompute_all_scores(db: Session, weights: Optional[Dict[str, float]] = None) -> int:
+    """Vectorized recompute of every composite score; returns the ideas updated"""
+    weights = weights or get_weights(db)
+    ideas = Idea.__table__
+    rows = db.execute(
+        select(ideas.c.id, ideas.c.desirability_score, ideas.c.feasibility_score, ideas.c.viability_score)
+        .where(ideas.c.desirability_score.isnot(None))
+        .where(ideas.c.feasibility_score.isnot(None))
+        .where(ideas.c.viability_score.isnot(None))
+    ).all()
+    if not rows:
+        return 0
+
+    ids = [row[0] for row in rows]
+    scores = np.array([row[1:] for row in rows], dtype=np.float64)
+    weight_vector = np.array([weights[criterion] for criterion in CRITERIA], dtype=np.float64)
+    composite = scores @ weight_vector / weight_vector.sum()
+
+    statement = (
+        update(ideas)
+        .where(ideas.c.id == bindparam("_id"))
+        .values(composite_score=bindparam("_composite"))
+    )
+    for start in range(0, len(ids), RECOMPUTE_BATCH_SIZE):
+        end = start + RECOMPUTE_BATCH_SIZE
+        db.execute(statement, [
+            {"_id": idea_id, "_composite": float(c)}
+            for idea_id, c in zip(ids[start:end], composite[start:end])
+        ])
+    return len(ids)
@@ -0,0 +1,49 @@
+"""
+In-process single-flight de-duplication of concurrent work.
+
+The first caller for a key starts the work as a task; callers arriving while it
+runs await the same task instead of repeating it. The task is shielded, so a
+client disconnecting does not cancel the work others are waiting on.
+
+The task's LLM calls run at the most important priority among its callers:
+an interactive request joining a bulk or background flight raises it.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from metrics import AI_SINGLEFLIGHT
+from scheduler import SharedPriority, current_priority, shared_priority
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a (operation, ...) key"""
+
+    def __init__(self):
+        self._calls: Dict[Tuple[Hashable, ...], Tuple[asyncio.Task, SharedPriority]] = {}
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Tuple[Hashable, ...], fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            priority = SharedPriority(current_priority())
+            # The task copies the context here, so its calls follow `priority`
+            with shared_priority(priority):
+                task = asyncio.ensure_future(fn())
+            self._calls[key] = (task, priority)
+            task.add_done_callback(lambda done: self._finished(key, done))
+            AI_SINGLEFLIGHT.labels(operation=key[0], role="leader").inc()
+        else:
+            task, priority = call
+            priority.raise_to(current_priority())
+            AI_SINGLEFLIGHT.labels(operation=key[0], role="follower").inc()
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task: asyncio.Task):
+        call = self._calls.get(key)
+        if call is not None and call[0] is task:
+            del self._calls[key]
+        # Mark the exception as retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
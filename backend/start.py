@@ -2,20 +2,25 @@
 """
 Startup script for the Idea Factory FastAPI backend.
 This script initializes the database with default evaluation criteria.
+
+Usage:
+    python start.py                     # development server with auto-reload
+    python start.py --prod --workers 4  # production server with 4 worker processes
 """
 
 import os
 import sys
-from sqlalchemy.orm import sessionmaker
-from database import engine, create_tables, EvaluationCriteria
+import argparse
+from database import create_session, create_tables, EvaluationCriteria, Idea
+from dedup import index_missing_ideas
+from scoring import recompute_all_scores
 
 def initialize_database():
     """Initialize the database with default data."""
     create_tables()
     
     # Create a session
-    Session = sessionmaker(bind=engine)
-    session = Session()
+    session = create_session()
     
     try:
         # Check if evaluation criteria already exist
@@ -24,6 +29,7 @@ def initialize_database():
         if not existing_criteria:
             # Create default evaluation criteria
             default_criteria = EvaluationCriteria(
+                version=1,
                 desirability="Does this idea solve a real, significant problem for a clear target audience? Is it something people would genuinely want or need?",
                 feasibility="Can this idea be built with current technology within a reasonable timeframe and budget? What are the primary technical hurdles?",
                 viability="Is there a clear path to creating a sustainable business around this idea? How would it generate revenue, and what is the potential market size?"
@@ -33,6 +39,20 @@ def initialize_database():
             print("[OK] Default evaluation criteria created")
         else:
             print("[OK] Evaluation criteria already exist")
+        
+        # Ideas created before duplicate detection existed
+        indexed = index_missing_ideas(session)
+        if indexed:
+            print(f"[OK] Indexed {indexed} ideas for duplicate detection")
+        
+        # Ideas evaluated before composite scores existed
+        unscored = session.query(Idea.id).filter(
+            Idea.current_evaluation_id.isnot(None), Idea.composite_score.is_(None)
+        ).first()
+        if unscored:
+            scored = recompute_all_scores(session)
+            session.commit()
+            print(f"[OK] Computed composite scores for {scored} ideas")
             
     except Exception as e:
         print(f"[ERROR] Error initializing database: {e}")
@@ -40,12 +60,36 @@ def initialize_database():
     finally:
         session.close()
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Start the Idea Factory backend")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--prod", action="store_true",
+                        help="Serve with several worker processes and without auto-reload")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "0")),
+                        help="Worker processes in production mode (default: WEB_CONCURRENCY or CPU count)")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
+    args = parse_args()
+
     print("Initializing Idea Factory database...")
+    # Done once here, before any worker starts, so workers never race on CREATE TABLE
     initialize_database()
     
     # Start the FastAPI server
     import uvicorn
     
-    print("Starting FastAPI server on http://localhost:8000")
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    if args.prod:
+        workers = args.workers or os.cpu_count() or 1
+        if workers > 1:
+            # Keep the per-worker read caches coherent (see cache.py); a local
+            # setting, e.g. one loaded from .env, would leave workers serving stale ideas
+            if os.getenv("CACHE_INVALIDATION", "db").lower() != "db":
+                print(f"[WARN] CACHE_INVALIDATION={os.environ['CACHE_INVALIDATION']} ignored with {workers} workers; using db")
+            os.environ["CACHE_INVALIDATION"] = "db"
+        print(f"Starting FastAPI server on http://{args.host}:{args.port} with {workers} workers")
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=workers, reload=False)
+    else:
+        print(f"Starting FastAPI server on http://localhost:{args.port}")
+        uvicorn.run("main:app", host=args.host, port=args.port, reload=True)
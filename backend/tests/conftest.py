@@ -0,0 +1,55 @@
+"""
+Shared test setup: a throwaway SQLite database and the fake LLM provider.
+
+The environment is set before any backend module is imported, since the
+database URL and provider are read at import time.
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+
+import httpx
+import pytest
+
+_DB_DIR = tempfile.mkdtemp(prefix="idea-factory-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ["AI_PROVIDER"] = "fake"
+os.environ["FAKE_LLM_LATENCY_MS"] = "50"
+os.environ["FAKE_LLM_LATENCY_DIST"] = "fixed"
+os.environ["FAKE_LLM_ERROR_RATE"] = "0"
+os.environ["AI_CACHE_SIZE"] = "0"
+
+# Import the backend now: pytest later puts the repository root, which has its
+# own main.py, ahead of backend/ on sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import app  # noqa: E402
+from ai_service import get_ai_service  # noqa: E402
+
+CRITERIA = {"desirability": "Do people want it?", "feasibility": "Can it be built?", "viability": "Can it pay for itself?"}
+
+@pytest.fixture
+def api():
+    """Run `scenario(client)` against the app, inside its lifespan, on a fresh event loop"""
+    def run(scenario):
+        async def main():
+            async with app.router.lifespan_context(app):
+                async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+                    return await scenario(client)
+        return asyncio.run(main())
+
+    return run
+
+@pytest.fixture
+def provider():
+    """The fake provider behind the process-wide AIService, with its call count reset"""
+    fake = get_ai_service().provider
+    fake.calls = 0
+    return fake
+
+async def create_idea(client, title: str, description: str) -> str:
+    await client.post("/api/evaluation-criteria", json=CRITERIA)
+    response = await client.post("/api/ideas", json={"title": title, "description": description}, params={"duplicate_policy": "allow"})
+    assert response.status_code == 200
+    return response.json()["id"]
@@ -0,0 +1,72 @@
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy import delete, insert
+
+import cache
+from cache import LRUCache, DatabaseChannel
+from database import create_tables, get_engine, CacheInvalidation
+
+def test_set_after_invalidation_is_dropped():
+    ideas = LRUCache("test-stale-set", 10)
+    # A reader loads a value, and a writer invalidates it before the reader stores it
+    version = ideas.version
+    ideas.invalidate("idea-1")
+    ideas.set("idea-1", "stale", version)
+    assert ideas.get("idea-1") is None
+
+    ideas.set("idea-1", "fresh", ideas.version)
+    assert ideas.get("idea-1") == "fresh"
+
+def test_lru_evicts_least_recently_used():
+    ideas = LRUCache("test-eviction", 2)
+    ideas.set("a", 1, ideas.version)
+    ideas.set("b", 2, ideas.version)
+    ideas.get("a")
+    ideas.set("c", 3, ideas.version)
+    assert ideas.get("b") is None
+    assert (ideas.get("a"), ideas.get("c")) == (1, 3)
+
+@pytest.fixture
+def channel(monkeypatch):
+    create_tables()
+    monkeypatch.setattr(cache, "CACHE_POLL_SECONDS", 0)
+    channel = DatabaseChannel(enabled=True)
+    channel.poll()
+    return channel
+
+def publish_from_other_worker(*keys):
+    """Insert invalidation rows as another worker would; returns their ids"""
+    now = datetime.utcnow()
+    with get_engine().begin() as conn:
+        return [
+            conn.execute(
+                insert(CacheInvalidation).values(cache="test-remote", key=key, origin=os.getpid() + 1, created_at=now)
+            ).inserted_primary_key[0]
+            for key in keys
+        ]
+
+def test_remote_invalidations_are_applied(channel):
+    remote = LRUCache("test-remote", 10)
+    remote.set("kept", 1, remote.version)
+    remote.set("dropped", 2, remote.version)
+    publish_from_other_worker("dropped")
+    channel.poll()
+    assert remote._entries == {"kept": 1}
+
+def test_pruned_invalidations_clear_every_cache(channel):
+    remote = LRUCache("test-remote", 10)
+    other = LRUCache("test-other", 10)
+    remote.set("kept", 1, remote.version)
+    other.set("unrelated", 2, other.version)
+
+    # Two invalidations are pruned before this worker polls again
+    missed = publish_from_other_worker("missed-1", "missed-2", "seen")
+    with get_engine().begin() as conn:
+        conn.execute(delete(CacheInvalidation).where(CacheInvalidation.id.in_(missed[:2])))
+    channel.poll()
+
+    assert remote._entries == {}
+    assert other._entries == {}
+    assert channel._last_id == missed[-1]
@@ -0,0 +1,80 @@
+from conftest import CRITERIA
+
+BEEHIVES = {"title": "Rooftop beehive rental", "description": "Rent unused rooftop space to urban beekeepers and sell the honey locally"}
+BEEHIVES_AGAIN = {"title": "Rooftop beehive rentals", "description": "Rent unused rooftop space to urban beekeepers and sell the honey locally."}
+QUANTUM = {"title": "Quantum tax software", "description": "Tax preparation that runs on quantum annealers for enterprises"}
+
+async def submit(client, idea: dict, policy: str):
+    return await client.post("/api/ideas", json=idea, params={"duplicate_policy": policy})
+
+def test_duplicate_policies(api):
+    async def scenario(client):
+        original = (await submit(client, BEEHIVES, "link")).json()
+        assert original["duplicate_of"] is None
+
+        linked = (await submit(client, BEEHIVES_AGAIN, "link")).json()
+        assert linked["duplicate_of"] == original["id"]
+
+        rejected = await submit(client, BEEHIVES_AGAIN, "reject")
+        assert rejected.status_code == 409
+        assert rejected.json()["detail"]["duplicate_of"] == original["id"]
+
+        merged = (await submit(client, BEEHIVES_AGAIN, "merge")).json()
+        assert merged["id"] == original["id"]
+        assert merged["votes"] == original["votes"] + 1
+
+        allowed = (await submit(client, BEEHIVES_AGAIN, "allow")).json()
+        assert allowed["duplicate_of"] is None
+
+        # Editing an idea re-checks it against the others
+        edited = (await client.put(f"/api/ideas/{allowed['id']}", json={"title": BEEHIVES_AGAIN["title"] + "!"})).json()
+        assert edited["duplicate_of"] == original["id"]
+        edited = (await client.put(f"/api/ideas/{allowed['id']}", json=QUANTUM)).json()
+        assert edited["duplicate_of"] is None
+
+        for idea_id in (original["id"], linked["id"], allowed["id"]):
+            await client.delete(f"/api/ideas/{idea_id}")
+
+    api(scenario)
+
+def test_duplicates_reuse_the_canonical_evaluation_only_while_similar(api, provider):
+    async def scenario(client):
+        await client.post("/api/evaluation-criteria", json=CRITERIA)
+        original = (await submit(client, BEEHIVES, "link")).json()
+        duplicate = (await submit(client, BEEHIVES_AGAIN, "link")).json()
+        assert duplicate["duplicate_of"] == original["id"]
+
+        await client.post("/api/ideas/evaluate", json={"idea_ids": [original["id"], duplicate["id"]]})
+        assert provider.calls == 1
+
+        # Once the duplicate is edited into a different idea it gets its own evaluation
+        await client.put(f"/api/ideas/{duplicate['id']}", json=QUANTUM)
+        await client.post("/api/ideas/evaluate", json={"idea_ids": [duplicate["id"]]})
+        assert provider.calls == 2
+
+        for idea_id in (original["id"], duplicate["id"]):
+            await client.delete(f"/api/ideas/{idea_id}")
+
+    api(scenario)
+
+def test_reuse_checks_the_current_signatures(api, provider):
+    async def scenario(client):
+        await client.post("/api/evaluation-criteria", json=CRITERIA)
+        original = (await submit(client, BEEHIVES, "link")).json()
+        duplicate = (await submit(client, BEEHIVES_AGAIN, "link")).json()
+        await client.post("/api/ideas/evaluate", json={"idea_ids": [original["id"]]})
+        assert provider.calls == 1
+
+        # The canonical idea drifts away and is re-evaluated; the link is left in place
+        await client.put(f"/api/ideas/{original['id']}", json=QUANTUM)
+        await client.post("/api/ideas/evaluate", json={"idea_ids": [original["id"]]})
+        assert provider.calls == 2
+        assert (await client.get(f"/api/ideas/{duplicate['id']}")).json()["duplicate_of"] == original["id"]
+
+        await client.post("/api/ideas/evaluate", json={"idea_ids": [duplicate["id"]]})
+        assert provider.calls == 3
+
+        for idea_id in (original["id"], duplicate["id"]):
+            await client.delete(f"/api/ideas/{idea_id}")
+
+    api(scenario)
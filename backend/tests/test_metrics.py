@@ -0,0 +1,33 @@
+import asyncio
+
+import httpx
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.middleware import Middleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from metrics import MetricsMiddleware, HTTP_REQUEST_DURATION, HTTP_IN_FLIGHT
+
+def test_background_tasks_are_not_timed_as_the_request():
+    background_started = asyncio.Event()
+
+    async def slow_background():
+        background_started.set()
+        await asyncio.sleep(0.3)
+
+    async def endpoint(request):
+        return PlainTextResponse("ok", background=BackgroundTask(slow_background))
+
+    app = Starlette(routes=[Route("/with-background", endpoint)], middleware=[Middleware(MetricsMiddleware)])
+    duration = HTTP_REQUEST_DURATION.labels(method="GET", route="/with-background")
+    in_flight = HTTP_IN_FLIGHT.labels(method="GET", route="/with-background")
+
+    async def scenario():
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            assert (await client.get("/with-background")).status_code == 200
+        assert background_started.is_set()
+        assert duration.sum < 0.3
+        assert in_flight.value == 0
+
+    asyncio.run(scenario())
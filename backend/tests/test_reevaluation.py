@@ -0,0 +1,47 @@
+from fastapi import BackgroundTasks
+
+import main
+from conftest import CRITERIA, create_idea
+from database import create_session, Idea
+from leases import acquire_lease, release_leases
+from main import get_current_criteria, reevaluate_stale_ideas, schedule_stale_reevaluation, stale_evaluations_query
+
+def stale_ids() -> list:
+    db = create_session()
+    try:
+        return [row.id for row in stale_evaluations_query(db, get_current_criteria(db)).with_entities(Idea.id)]
+    finally:
+        db.close()
+
+def test_stale_pass_walks_batches_past_skipped_ideas(api, provider, monkeypatch):
+    monkeypatch.setattr(main, "REEVALUATION_BATCH_SIZE", 2)
+
+    async def scenario(client):
+        idea_ids = [
+            await create_idea(client, f"Stale idea {i}", f"Idea {i} for the re-evaluation test {'z' * i}")
+            for i in range(5)
+        ]
+        await client.post("/api/ideas/evaluate", json={"idea_ids": idea_ids})
+        await client.post("/api/evaluation-criteria", json={**CRITERIA, "viability": "Will it make money?"})
+        stale = stale_ids()
+        assert set(idea_ids) <= set(stale)
+
+        # Another request is evaluating the idea that comes first
+        db = create_session()
+        token = acquire_lease(db, stale[0], "evaluate")
+        provider.calls = 0
+        try:
+            await reevaluate_stale_ideas()
+        finally:
+            release_leases(db, [stale[0]], "evaluate", token)
+            db.close()
+
+        assert stale_ids() == [stale[0]]
+        assert provider.calls == len(stale) - 1
+
+    api(scenario)
+
+def test_unrun_schedule_does_not_block_later_passes():
+    # The flag is only set once the pass runs, so a dropped task leaves it clear
+    assert schedule_stale_reevaluation(BackgroundTasks())
+    assert schedule_stale_reevaluation(BackgroundTasks())
@@ -0,0 +1,96 @@
+import asyncio
+from collections import Counter
+
+from scheduler import PriorityScheduler, ai_priority, current_priority
+from singleflight import SingleFlight
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def test_bulk_and_background_together_leave_the_reserve_free():
+    async def scenario():
+        scheduler = PriorityScheduler(max_concurrency=4, interactive_reserved=1)
+        done = asyncio.Event()
+
+        async def hold(priority):
+            async with scheduler.slot(priority):
+                await done.wait()
+
+        holders = [asyncio.create_task(hold(priority)) for priority in ["bulk"] * 3 + ["background"] * 2]
+        await settle()
+        assert scheduler._active == 3
+        assert scheduler.queue_depth("background") + scheduler.queue_depth("bulk") == 2
+
+        # The reserved slot is still free for an interactive call
+        await asyncio.wait_for(scheduler.acquire("interactive"), timeout=1)
+        assert scheduler._running["interactive"] == 1
+        scheduler.release("interactive")
+        # ...and is not handed to the queued bulk or background calls afterwards
+        await settle()
+        assert scheduler._active == 3
+
+        done.set()
+        await asyncio.gather(*holders)
+        assert scheduler._active == 0
+
+    asyncio.run(scenario())
+
+def test_slots_are_shared_by_weight_when_all_classes_wait():
+    async def scenario():
+        scheduler = PriorityScheduler(max_concurrency=1, interactive_reserved=0)
+        order = []
+
+        async def call(priority):
+            async with scheduler.slot(priority):
+                order.append(priority)
+                await asyncio.sleep(0)
+
+        # Hold the only slot while every class queues up
+        await scheduler.acquire("interactive")
+        calls = [asyncio.create_task(call(priority)) for priority in ("background", "bulk", "interactive") for _ in range(30)]
+        await settle()
+        scheduler.release("interactive")
+        await asyncio.gather(*calls)
+
+        # Weights are 8:3:1 (give or take one turn of rounding), and the lowest class still gets its turns
+        shares = Counter(order[:24])
+        for priority, expected in {"interactive": 16, "bulk": 6, "background": 2}.items():
+            assert abs(shares[priority] - expected) <= 1
+        assert order.count("background") == 30
+
+    asyncio.run(scenario())
+
+def test_priority_follows_the_context():
+    assert current_priority() == "interactive"
+    with ai_priority("background"):
+        assert current_priority() == "background"
+    assert current_priority() == "interactive"
+
+def test_interactive_follower_raises_a_queued_bulk_flight():
+    async def scenario():
+        scheduler = PriorityScheduler(max_concurrency=2, interactive_reserved=1)
+        flights = SingleFlight()
+
+        async def work():
+            async with scheduler.slot():
+                return current_priority()
+
+        async def request(priority):
+            with ai_priority(priority):
+                return await flights.do(("test", "idea"), work)
+
+        # Another bulk call fills the shared slot, so the flight queues as bulk
+        await scheduler.acquire("bulk")
+        leader = asyncio.create_task(request("bulk"))
+        await settle()
+        assert scheduler.queue_depth("bulk") == 1
+
+        # An interactive request joining it moves the queued call onto the reserved slot
+        follower = asyncio.create_task(request("interactive"))
+        assert await asyncio.wait_for(asyncio.gather(leader, follower), timeout=1) == ["interactive", "interactive"]
+        assert scheduler.queue_depth("bulk") == 0
+        scheduler.release("bulk")
+        assert scheduler._active == 0
+
+    asyncio.run(scenario())
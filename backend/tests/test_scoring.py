@@ -0,0 +1,42 @@
+from conftest import create_idea
+from database import create_session, Idea
+
+def mid_rank(score: float) -> float:
+    """Percentile of a score among every scored idea, computed the slow way"""
+    db = create_session()
+    try:
+        scores = [row.composite_score for row in db.query(Idea.composite_score).filter(Idea.composite_score.isnot(None))]
+    finally:
+        db.close()
+    lower = sum(other < score for other in scores)
+    equal = sum(other == score for other in scores)
+    return 100.0 * (lower + 0.5 * equal) / len(scores)
+
+def test_percentiles_follow_other_ideas_evaluations(api, provider):
+    async def scenario(client):
+        idea_ids = [
+            await create_idea(client, f"Ranked idea {i}", f"Idea {i} for the percentile test {'y' * i}")
+            for i in range(4)
+        ]
+        first = idea_ids[0]
+        await client.post("/api/ideas/evaluate", json={"idea_ids": [first]})
+        idea = (await client.get(f"/api/ideas/{first}")).json()
+        assert idea["score_percentile"] == mid_rank(idea["composite_score"])
+
+        # Evaluating the others moves the first idea's rank without rewriting it
+        await client.post("/api/ideas/evaluate", json={"idea_ids": idea_ids[1:]})
+        ideas = [(await client.get(f"/api/ideas/{idea_id}")).json() for idea_id in idea_ids]
+        for idea in ideas:
+            assert idea["score_percentile"] == mid_rank(idea["composite_score"])
+
+        top = (await client.get("/api/ideas/top", params={"by": "score", "k": 100})).json()
+        for idea in top:
+            assert idea["score_percentile"] == mid_rank(idea["composite_score"])
+
+        # Deleting a scored idea re-ranks the rest at read time too
+        await client.delete(f"/api/ideas/{idea_ids[-1]}")
+        for idea_id in idea_ids[:-1]:
+            idea = (await client.get(f"/api/ideas/{idea_id}")).json()
+            assert idea["score_percentile"] == mid_rank(idea["composite_score"])
+
+    api(scenario)
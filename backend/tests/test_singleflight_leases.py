@@ -0,0 +1,90 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from conftest import create_idea
+from ai_service import get_ai_service
+from database import create_session, get_engine, Idea
+from leases import acquire_lease, release_leases
+from scheduler import PriorityScheduler
+
+def test_concurrent_evaluations_share_one_provider_call(api, provider):
+    async def scenario(client):
+        idea_id = await create_idea(client, "Rooftop beehives", "Rent rooftop space to urban beekeepers")
+        provider.calls = 0
+        responses = await asyncio.gather(*[
+            client.post("/api/ideas/evaluate", json={"idea_ids": [idea_id]}) for _ in range(5)
+        ])
+        assert [response.status_code for response in responses] == [200] * 5
+        assert all(response.json()["in_progress"] == [] for response in responses)
+        assert provider.calls == 1
+        idea = (await client.get(f"/api/ideas/{idea_id}")).json()
+        assert idea["evaluation"] is not None
+        assert not idea["is_evaluating"]
+
+    api(scenario)
+
+def test_leased_idea_is_skipped_until_the_lease_expires(api, provider):
+    async def scenario(client):
+        idea_id = await create_idea(client, "Tool library", "Lend power tools to neighbours by the day")
+        db = create_session()
+        try:
+            # A request in another worker holds the lease
+            stale_token = acquire_lease(db, idea_id, "evaluate")
+            assert stale_token is not None
+            assert acquire_lease(db, idea_id, "evaluate") is None
+
+            response = await client.post("/api/ideas/evaluate", json={"idea_ids": [idea_id]})
+            assert response.json()["in_progress"] == [idea_id]
+            assert provider.calls == 0
+            assert (await client.get(f"/api/ideas/{idea_id}")).json()["is_evaluating"]
+
+            # The holder crashed; once its lease runs out the idea can be taken over
+            db.query(Idea).filter(Idea.id == idea_id).update(
+                {Idea.evaluation_lease_expires_at: datetime.utcnow() - timedelta(seconds=1)}
+            )
+            db.commit()
+            response = await client.post("/api/ideas/evaluate", json={"idea_ids": [idea_id]})
+            assert response.json()["in_progress"] == []
+            assert provider.calls == 1
+
+            # The late holder releasing its lease must not clear a newer one
+            token = acquire_lease(db, idea_id, "evaluate")
+            release_leases(db, [idea_id], "evaluate", stale_token)
+            assert db.query(Idea.evaluation_lease_token).filter(Idea.id == idea_id).scalar() == token
+            release_leases(db, [idea_id], "evaluate", token)
+            assert db.query(Idea.evaluation_lease_token).filter(Idea.id == idea_id).scalar() is None
+        finally:
+            db.close()
+
+    api(scenario)
+
+def test_requests_waiting_on_the_ai_hold_no_connections(api, provider, monkeypatch):
+    # Two AI slots for more concurrent requests than the pool has connections (5 + 10 overflow)
+    monkeypatch.setattr(get_ai_service(), "scheduler", PriorityScheduler(max_concurrency=2, interactive_reserved=1))
+    pool = get_engine().pool
+
+    async def scenario(client):
+        idea_ids = [
+            await create_idea(client, f"Pool idea {i}", f"Idea number {i} of the connection pool test {'x' * i}")
+            for i in range(20)
+        ]
+        peak = 0
+
+        async def sample():
+            nonlocal peak
+            while True:
+                peak = max(peak, pool.checkedout())
+                await asyncio.sleep(0.002)
+
+        sampler = asyncio.create_task(sample())
+        responses = await asyncio.gather(
+            *[client.post("/api/ideas/evaluate", json={"idea_ids": [idea_id]}) for idea_id in idea_ids],
+            *[client.post(f"/api/ideas/{idea_id}/classify") for idea_id in idea_ids[:12]],
+        )
+        sampler.cancel()
+
+        assert [response.status_code for response in responses] == [200] * 32
+        assert provider.calls == 32
+        assert peak < pool.size()
+
+    api(scenario)
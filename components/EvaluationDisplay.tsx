@@ -7,13 +7,15 @@ interface EvaluationDisplayProps {
   evaluation: IdeaEvaluation;
 }
 
-const CriterionDisplay: React.FC<{ title: string; data: { score: number; reasoning: string } }> = ({ title, data }) => (
+const CriterionDisplay: React.FC<{ title: string; data: { score: number; reasoning: string | null } }> = ({ title, data }) => (
   <div>
     <h4 className="text-lg font-semibold text-slate-800 dark:text-slate-200 mb-2">{title}</h4>
     <ScoreBar score={data.score} label={title} />
-    <p className="text-sm text-slate-600 dark:text-slate-400 mt-2 bg-slate-100 dark:bg-slate-700/50 p-3 rounded-md">
-      {data.reasoning}
-    </p>
+    {data.reasoning && (
+      <p className="text-sm text-slate-600 dark:text-slate-400 mt-2 bg-slate-100 dark:bg-slate-700/50 p-3 rounded-md">
+        {data.reasoning}
+      </p>
+    )}
   </div>
 );
 
@@ -28,10 +30,12 @@ export const EvaluationDisplay: React.FC<EvaluationDisplayProps> = ({ evaluation
       </h3>
       <Card className="bg-slate-50 dark:bg-slate-800/70 border border-slate-200 dark:border-slate-700">
         <div className="space-y-6">
-          <div>
-            <h4 className="text-lg font-semibold text-slate-800 dark:text-slate-200 mb-2">Summary</h4>
-            <p className="text-slate-700 dark:text-slate-300 italic">{evaluation.summary}</p>
-          </div>
+          {evaluation.summary && (
+            <div>
+              <h4 className="text-lg font-semibold text-slate-800 dark:text-slate-200 mb-2">Summary</h4>
+              <p className="text-slate-700 dark:text-slate-300 italic">{evaluation.summary}</p>
+            </div>
+          )}
           <div className="space-y-6 pt-4 border-t border-slate-200 dark:border-slate-700">
             <CriterionDisplay title="Desirability" data={evaluation.desirability} />
             <CriterionDisplay title="Feasibility" data={evaluation.feasibility} />
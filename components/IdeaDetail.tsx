@@ -1,5 +1,7 @@
 import React, { useState, useEffect } from 'react';
-import { Idea, IdeaStatus } from '../types';
+import { Idea, IdeaStatus, IdeaEvaluation } from '../types';
+import { apiService } from '../api';
+import { convertApiIdeaToIdea } from '../utils/apiConverter';
 import { Button } from './ui/Button';
 import { Card } from './ui/Card';
 import { EvaluationDisplay } from './EvaluationDisplay';
@@ -104,6 +106,21 @@ export const IdeaDetail: React.FC<IdeaDetailProps> = ({ idea, onSave, onPublish,
 
   const existingIdea = isExistingIdea(idea) ? idea : null;
 
+  // The ideas list only carries scores; fetch the summary and reasoning for this view
+  const [detailedEvaluation, setDetailedEvaluation] = useState<IdeaEvaluation | undefined>(undefined);
+  useEffect(() => {
+    setDetailedEvaluation(undefined);
+    if (!existingIdea?.evaluation) return;
+    let cancelled = false;
+    apiService.getIdea(existingIdea.id)
+      .then(apiIdea => {
+        if (!cancelled) setDetailedEvaluation(convertApiIdeaToIdea(apiIdea).evaluation);
+      })
+      .catch(err => console.error('Failed to load evaluation details:', err));
+    return () => { cancelled = true; };
+  }, [existingIdea?.id, existingIdea?.evaluation]);
+  const evaluation = detailedEvaluation ?? existingIdea?.evaluation;
+
   if (isEditing) {
     return (
       <Card className="max-w-3xl mx-auto animate-fade-in">
@@ -196,7 +213,7 @@ export const IdeaDetail: React.FC<IdeaDetailProps> = ({ idea, onSave, onPublish,
             <p className="text-slate-600 dark:text-slate-400 mt-4 mb-8 whitespace-pre-wrap">{existingIdea.description}</p>
             
             {existingIdea.isEvaluating && <EvaluationLoadingState />}
-            {existingIdea.evaluation && <EvaluationDisplay evaluation={existingIdea.evaluation} />}
+            {evaluation && <EvaluationDisplay evaluation={evaluation} />}
             
             <div className="mt-8 pt-6 border-t border-slate-200 dark:border-slate-700 flex justify-between items-center">
                 <div>
@@ -4,18 +4,18 @@ export enum IdeaStatus {
 }
 
 export interface IdeaEvaluation {
-  summary: string;
+  summary: string | null;
   desirability: {
     score: number;
-    reasoning: string;
+    reasoning: string | null;
   };
   feasibility: {
     score: number;
-    reasoning: string;
+    reasoning: string | null;
   };
   viability: {
     score: number;
-    reasoning: string;
+    reasoning: string | null;
   };
 }
 